@@ -1,11 +1,16 @@
 import streamlit as st
 import os
-import shutil
-import io
 import time
-from concurrent.futures import ThreadPoolExecutor
-from PIL import Image
+import itertools
 from modules.renamer import EasyRenamer
+from modules.name_template import NameTemplate, TemplateError
+from modules.thumbnails import ThumbnailCache
+from modules.upload_store import UploadStore
+from modules.upload_catalog import SORT_LABELS
+from modules.keyword_index import KeywordIndex, MATCH_ALL, MATCH_ANY
+from modules.folder_source import FolderSource
+from modules.core import BATCH_NAME_TEMPLATE, load_app_config
+from src.rename_journal import RenameJournal
 from modules.ui_components import (
     load_css, 
     create_image_list_component, 
@@ -13,6 +18,134 @@ from modules.ui_components import (
     create_format_preview
 )
 
+# Rename results listed after a batch
+RESULTS_SHOWN = 200
+
+# Rows per page of the batch naming preview
+PREVIEW_PAGE_SIZE = 100
+
+def success_after_rerun(message):
+    """Show a success message on the next run; one shown right before st.rerun() is never seen"""
+    st.session_state.pending_success = message
+
+
+def discard_index_job():
+    """Stop the metadata index job, if any, and drop the state built from it"""
+    index_job = st.session_state.pop('index_job', None)
+    if index_job is not None:
+        # Otherwise its pool keeps reading files nobody will look at
+        index_job.cancel()
+    st.session_state.pop('keyword_index', None)
+    st.session_state.pop('keyword_filter', None)
+
+
+def reset_image_source():
+    """Forget everything derived from the current images (on clear, reload or source switch)"""
+    discard_index_job()
+    st.session_state.pop('selected_image', None)
+    st.session_state.pop('batch_names', None)
+
+
+def run_rename(renamer, image_source, source_kind, rename_mode, rename_input,
+               output_dir=None, output_format=None, pairs=None):
+    """
+    Run one rename batch with the chosen output mode and show the results.
+    pairs holds precomputed (file, new name) pairs from the batch naming mode.
+    """
+    # Show progress
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+
+    status_text.text("リネーム処理を開始します...")
+
+    def update_progress(progress):
+        progress_bar.progress(progress.files_done / progress.total_files)
+        status_text.text(
+            f"{progress.files_done}/{progress.total_files} 枚処理済み "
+            f"({progress.bytes_done / 1024 / 1024:.1f}/{progress.total_bytes / 1024 / 1024:.1f} MB, "
+            f"エラー {progress.errors} 件)"
+        )
+
+    if source_kind == 'folder' and rename_mode == 'inplace':
+        # Journaled in-place rename; the folder index is updated per file
+        try:
+            plan, journal = renamer.rename_in_place(
+                image_source.folder,
+                image_source.names(),
+                rename_input,
+                st.session_state.custom_numbering,
+                st.session_state.number_position,
+                on_rename=image_source.renamed,
+                pairs=pairs
+            )
+            st.session_state.last_journal = journal.path
+            rename_results = {change.old: change.new for change in plan.changes}
+            # A batch naming preview refers to the old names
+            st.session_state.pop('batch_names', None)
+            progress_bar.progress(100)
+            status_text.text(f"処理完了！ ({len(plan.steps)} 件をリネーム, 重複のため変更 {plan.adjusted_count} 件)")
+        except ValueError as e:
+            # Raised before anything is renamed
+            st.error(f"リネームを中止しました: {e}")
+            rename_results = {}
+        except OSError as e:
+            # The journal stays pending and can be rolled back with src/rename_journal.py
+            st.error(f"リネームを中断しました: {e}")
+            image_source.rescan()
+            # Ids change with the rescan
+            reset_image_source()
+            rename_results = {}
+        st.session_state.pop('selected_image', None)
+    elif source_kind == 'folder':
+        try:
+            rename_results = renamer.link_files(
+                image_source.paths(),
+                rename_input,
+                output_dir,
+                st.session_state.custom_numbering,
+                st.session_state.number_position,
+                progress_callback=update_progress,
+                pairs=pairs
+            )
+            progress_bar.progress(100)
+            status_text.text(f"処理完了！ ({len(rename_results)} 枚を {output_dir} に出力)")
+        except ValueError as e:
+            # Raised before any file is written
+            st.error(f"リネームを中止しました: {e}")
+            rename_results = {}
+    else:
+        # Execute rename process, writing the ZIP straight from the uploads
+        archive, rename_results = renamer.create_archive(
+            image_source.paths(), 
+            rename_input, 
+            st.session_state.custom_numbering,
+            st.session_state.number_position,
+            mode=rename_mode,
+            output_format=output_format if rename_mode == 'convert' else None,
+            progress_callback=update_progress,
+            pairs=pairs
+        )
+
+        # Complete progress
+        progress_bar.progress(100)
+        status_text.text(f"処理完了！ ({len(rename_results)} 枚)")
+
+        # Display download button (Streamlit needs bytes, not the temporary file object)
+        with archive:
+            st.download_button(
+                label="ZIPファイルをダウンロード",
+                data=archive.read(),
+                file_name="renamed_images.zip",
+                mime="application/zip"
+            )
+
+    # Display results (a whole batch can be 100k files, so only the first ones)
+    st.subheader("リネーム結果")
+    for original, new_name in itertools.islice(rename_results.items(), RESULTS_SHOWN):
+        st.write(f"{os.path.basename(original)} → {new_name}")
+    if len(rename_results) > RESULTS_SHOWN:
+        st.write(f"ほか {len(rename_results) - RESULTS_SHOWN} 件")
+
 def main():
     # Page configuration
     st.set_page_config(
@@ -26,6 +159,11 @@ def main():
     
     st.title("🖼️ Easy Renamer - 画像リネームツール")
 
+    # Message left by the action that triggered this rerun
+    pending_success = st.session_state.pop('pending_success', None)
+    if pending_success:
+        st.success(pending_success)
+
     # Initialize the renamer
     renamer = EasyRenamer()
 
@@ -33,34 +171,115 @@ def main():
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["リネーム", "定型文管理", "検索ワード管理", "メタデータキーワード管理", "キーワードマッピング"])
 
     with tab1:
-        st.header("📤 画像アップロード")
+        st.header("📤 画像の読み込み")
         
-        # Cache uploaded files to prevent reloading
-        if 'uploaded_files' not in st.session_state:
-            st.session_state.uploaded_files = None
-            
-        uploaded_files = st.file_uploader(
-            "画像をアップロード (最大2GB/ファイル)", 
-            accept_multiple_files=True, 
-            type=['png', 'jpg', 'jpeg', 'webp'],
-            help="最大2GBまでの画像をアップロードできます",
-            key="file_uploader"
+        # Uploads from the browser, or a folder on the server (renamed without any upload/ZIP I/O)
+        source_kind = st.radio(
+            "画像の取得元",
+            ['upload', 'folder'],
+            format_func=lambda x: 'アップロード' if x == 'upload' else 'サーバー上のフォルダ',
+            horizontal=True,
+            key="source_kind_radio",
+            on_change=reset_image_source
         )
         
-        if uploaded_files:
-            st.session_state.uploaded_files = uploaded_files
+        if source_kind == 'upload':
+            # Uploads are spooled to a per-session temp directory; only handles stay in memory
+            if 'upload_store' not in st.session_state:
+                st.session_state.upload_store = UploadStore()
+                st.session_state.uploader_key = 0
+            upload_store = st.session_state.upload_store
+                
+            uploaded_files = st.file_uploader(
+                "画像をアップロード (最大2GB/ファイル)", 
+                accept_multiple_files=True, 
+                type=['png', 'jpg', 'jpeg', 'webp'],
+                help="最大2GBまでの画像をアップロードできます",
+                key=f"file_uploader_{st.session_state.uploader_key}"
+            )
+            
+            if uploaded_files:
+                for uploaded_file in uploaded_files:
+                    upload_store.add(uploaded_file)
+                # A new widget key makes Streamlit drop its in-memory copies
+                st.session_state.uploader_key += 1
+                st.rerun()
+            
+            if len(upload_store):
+                col_count, col_reset = st.columns([3, 1])
+                with col_count:
+                    st.caption(f"{len(upload_store)} 枚 ({upload_store.total_size() / 1024 / 1024:.1f} MB) を一時フォルダに保存済み")
+                with col_reset:
+                    if st.button("アップロードをクリア", use_container_width=True):
+                        upload_store.clear()
+                        reset_image_source()
+                        st.rerun()
+            image_source = upload_store
+        else:
+            col_folder, col_load = st.columns([3, 1])
+            with col_folder:
+                folder_path = st.text_input(
+                    "フォルダのパス",
+                    value=load_app_config().get('default_folder', ''),
+                    key="folder_path_input",
+                    help="サーバー上の画像フォルダ。画像はアップロードせずにその場で処理します"
+                )
+            with col_load:
+                if st.button("フォルダ読み込み", use_container_width=True):
+                    if os.path.isdir(folder_path):
+                        st.session_state.folder_source = FolderSource(folder_path)
+                        reset_image_source()
+                    else:
+                        st.error("指定されたフォルダが存在しません")
+            
+            image_source = st.session_state.get('folder_source')
+            if image_source is not None:
+                st.caption(f"{image_source.folder}: {len(image_source)} 枚 ({image_source.total_size() / 1024 / 1024:.1f} MB)")
 
-        if st.session_state.uploaded_files:
+        if image_source is not None and len(image_source):
             # Create a three-column layout for better organization
             col_list, col_rename, col_preview = st.columns([1, 1, 1])
             
-            # Pagination for image list
-            page_size = 50
-            total_pages = (len(st.session_state.uploaded_files) - 1) // page_size + 1
+            # Keyword facets come from the batch metadata index below
+            keyword_index = st.session_state.get('keyword_index')
+            index_job = st.session_state.get('index_job')
+            # Rows extracted with older keyword settings would filter by the wrong keywords
+            index_stale = index_job is not None and not renamer.index_is_current(index_job)
+            if keyword_index is not None and index_job is not None and not index_stale:
+                keyword_index.sync(index_job, image_source.catalog)
             
             with col_list:
                 st.subheader("画像一覧")
                 
+                # Faceted filter: ids come from the inverted keyword index
+                filtered_ids = None
+                if index_stale:
+                    st.caption("キーワード設定が変更されたため絞り込みは使えません。メタデータを再解析してください")
+                elif keyword_index is not None and len(keyword_index):
+                    facet_counts = dict(keyword_index.facets())
+                    col_facet, col_mode = st.columns([3, 1])
+                    with col_facet:
+                        filter_keywords = st.multiselect(
+                            "キーワードで絞り込み",
+                            list(facet_counts),
+                            format_func=lambda keyword: f"{keyword} ({facet_counts[keyword]})",
+                            key="keyword_filter"
+                        )
+                    with col_mode:
+                        match_mode = st.radio(
+                            "条件",
+                            (MATCH_ALL, MATCH_ANY),
+                            format_func={MATCH_ALL: "すべて含む", MATCH_ANY: "いずれか"}.get,
+                            key="keyword_filter_mode"
+                        )
+                    if filter_keywords:
+                        filtered_ids = keyword_index.filter(filter_keywords, match_mode)
+                
+                # Pagination for image list (counts follow the filter)
+                page_size = 50
+                list_count = len(filtered_ids) if filtered_ids is not None else len(image_source)
+                total_pages = max(1, (list_count - 1) // page_size + 1)
+                
                 col_page, col_info = st.columns([1, 1])
                 with col_page:
                     page_number = st.number_input(
@@ -71,21 +290,32 @@ def main():
                     )
                 
                 with col_info:
-                    st.info(f"全 {len(st.session_state.uploaded_files)} 枚中 {page_size} 枚を表示中 (全 {total_pages} ページ)")
+                    st.info(f"全 {list_count} 枚中 {min(page_size, list_count)} 枚を表示中 (全 {total_pages} ページ)")
                 
-                start_idx = (page_number - 1) * page_size
-                end_idx = min(start_idx + page_size, len(st.session_state.uploaded_files))
-                page_files = st.session_state.uploaded_files[start_idx:end_idx]
+                sort_key = st.selectbox(
+                    "並び順",
+                    list(SORT_LABELS),
+                    format_func=SORT_LABELS.get,
+                    key="image_sort"
+                )
+                page_files = image_source.page(page_number, page_size, sort_key, subset=filtered_ids)
+                if not page_files:
+                    st.write("条件に合う画像がありません")
 
-                # Initialize or get selected image
-                if 'selected_image' not in st.session_state and page_files:
-                    st.session_state.selected_image = page_files[0].name
+                # Initialize or get selected image (stored by catalog id)
+                if st.session_state.get('selected_image') is None and page_files:
+                    st.session_state.selected_image = page_files[0].id
                 
                 # Display clickable image list
-                selected_image_name = create_image_list_component(page_files, st.session_state.get('selected_image'))
+                selected_image_id = create_image_list_component(
+                    page_files, st.session_state.get('selected_image'), image_source.label
+                )
                 
                 # Update session state
-                st.session_state.selected_image = selected_image_name
+                st.session_state.selected_image = selected_image_id
+            
+            # Find the selected image file (dict lookup by id)
+            selected_image = image_source.get(selected_image_id)
             
             with col_rename:           
                 # Rename settings
@@ -125,25 +355,72 @@ def main():
                         key="custom_numbering_input"
                     )
                 
+                # Validate the numbering format once, not per file at rename time
+                try:
+                    renamer.compile_name_template("", st.session_state.custom_numbering, st.session_state.number_position)
+                except TemplateError as e:
+                    st.error(f"連番形式が不正です: {e}")
+                
                 # Show preview of the format
                 create_format_preview(st.session_state.custom_numbering, 
                                      st.session_state.number_position, 
                                      "ファイル名")
                 
-                # Find the selected image file
-                selected_image = next((f for f in st.session_state.uploaded_files if f.name == selected_image_name), None)
+                if source_kind == 'upload':
+                    # Output mode: byte copy keeps metadata, convert re-encodes
+                    col_mode, col_output_format = st.columns(2)
+                    
+                    with col_mode:
+                        rename_mode = st.radio(
+                            "出力モード",
+                            ['copy', 'convert'],
+                            format_func=lambda x: 'そのまま (高速)' if x == 'copy' else '形式変換',
+                            horizontal=True,
+                            key="rename_mode_radio",
+                            help="「そのまま」は元のデータをコピーするため、メタデータや画質が保持されます"
+                        )
+                    
+                    with col_output_format:
+                        output_format = st.selectbox(
+                            "変換後の形式",
+                            ['PNG', 'JPEG', 'WEBP'],
+                            disabled=rename_mode != 'convert',
+                            key="output_format_select"
+                        )
+                else:
+                    # Folder mode never reads the image data: rename or hardlink
+                    col_mode, col_output_dir = st.columns(2)
+                    
+                    with col_mode:
+                        rename_mode = st.radio(
+                            "出力モード",
+                            ['inplace', 'link'],
+                            format_func=lambda x: 'その場でリネーム' if x == 'inplace' else '出力フォルダにリンク',
+                            horizontal=True,
+                            key="folder_mode_radio",
+                            help="「その場でリネーム」は元に戻せるよう履歴を記録します。"
+                                 "「リンク」はハードリンクを作成します (別ボリュームではコピー)"
+                        )
+                    
+                    with col_output_dir:
+                        output_dir = st.text_input(
+                            "出力フォルダ",
+                            value=os.path.join(image_source.folder, 'renamed'),
+                            disabled=rename_mode != 'link',
+                            key="folder_output_input"
+                        )
                 
                 # Extract and display metadata
                 st.subheader("メタデータキーワード")
                 
-                # Initialize metadata cache if needed
-                if 'metadata_cache' not in st.session_state:
-                    st.session_state.metadata_cache = {}
-                
                 # Extract metadata and mapped keywords
                 if selected_image:
-                    # Extract metadata
-                    metadata_result = renamer.extract_metadata_keywords(selected_image)
+                    # Extract metadata once per settings version; the record keeps the result
+                    metadata_result = selected_image.cached_metadata(renamer.settings_version)
+                    if metadata_result is None:
+                        # Served from the shared on-disk cache when possible
+                        metadata_result = renamer.extract_metadata_keywords(selected_image.path)
+                        selected_image.store_metadata(renamer.settings_version, metadata_result)
                     
                     # Store extracted keywords for word blocks
                     if 'extracted_keywords' not in st.session_state:
@@ -167,12 +444,42 @@ def main():
                                 st.write(", ".join(metadata_result['mapped']))
                             else:
                                 st.write("なし")
+                        
+                        # Structured generation parameters (A1111 / ComfyUI)
+                        generation = metadata_result.get('generation')
+                        if generation:
+                            with st.expander("生成パラメータ"):
+                                st.write(f"Steps: {generation.get('steps') or '-'} / "
+                                         f"CFG scale: {generation.get('cfg_scale') or '-'} / "
+                                         f"Seed: {generation.get('seed') or '-'}")
+                                st.write(f"Model: {generation.get('model') or '-'}")
+                                st.text_area("Prompt", generation.get('positive') or '', disabled=True)
+                                st.text_area("Negative prompt", generation.get('negative') or '', disabled=True)
                     else:
                         st.warning("メタデータが見つかりませんでした")
                 
                 # Rename blocks
                 st.markdown('<div class="custom-header">📝 リネーム用ワードブロック</div>', unsafe_allow_html=True)
                 
+                # Word search over the registered vocabulary (prefix and substring)
+                word_query = st.text_input(
+                    "ワード検索",
+                    key="word_search_input",
+                    placeholder="例: 少女",
+                    help="登録済みの定型文・ビッグワード・スモールワードから検索します"
+                )
+                if word_query:
+                    matches = renamer.word_index.search(word_query, limit=20)
+                    if matches:
+                        match_cols = st.columns(5)
+                        for idx, word in enumerate(matches):
+                            with match_cols[idx % 5]:
+                                if st.button(word, key=f"word_match_{idx}", use_container_width=True):
+                                    st.session_state.rename_input = f"{st.session_state.rename_input} {word}".strip()
+                                    st.rerun()
+                    else:
+                        st.caption("一致するワードがありません")
+                
                 # Create word blocks with improved functionality
                 create_word_blocks_component(renamer, st.session_state.extracted_keywords)
                 
@@ -188,12 +495,18 @@ def main():
                 st.session_state.rename_input = rename_input
                 st.markdown('</div>', unsafe_allow_html=True)
 
-                # Character count validation
-                char_count = len(rename_input)
-                if char_count > 130:
-                    st.markdown(f"<span style='color:red'>文字数: {char_count} (130文字を超えています)</span>", unsafe_allow_html=True)
+                # Filename length validation (UTF-8 bytes, incl. numbering and extension)
+                sample_name = renamer.sample_filename(
+                    rename_input,
+                    st.session_state.custom_numbering,
+                    st.session_state.number_position,
+                    image_source.page(1, 1)[0].name
+                )
+                byte_count = len(sample_name.encode('utf-8'))
+                if byte_count > renamer.max_filename_length:
+                    st.markdown(f"<span style='color:red'>文字数: {len(rename_input)} / ファイル名: {byte_count} バイト ({renamer.max_filename_length} バイトを超えるため切り詰められます)</span>", unsafe_allow_html=True)
                 else:
-                    st.write(f"文字数: {char_count}")
+                    st.write(f"文字数: {len(rename_input)} / ファイル名: {byte_count} / {renamer.max_filename_length} バイト")
 
                 # Rename buttons
                 col_rename_btn, col_clear = st.columns([3, 1])
@@ -204,78 +517,158 @@ def main():
                 with col_clear:
                     if st.button("クリア", use_container_width=True):
                         st.session_state.rename_input = ""
-                        st.experimental_rerun()
+                        st.rerun()
 
                 # Rename processing
                 if rename_button:
                     if rename_input:
-                        # Show progress
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        status_text.text("リネーム処理を開始します...")
-                        time.sleep(0.5)  # Small delay for UI feedback
-                        
-                        # Execute rename process
-                        rename_results = renamer.rename_files(
-                            st.session_state.uploaded_files, 
-                            rename_input, 
-                            st.session_state.custom_numbering,
-                            st.session_state.number_position
+                        run_rename(
+                            renamer, image_source, source_kind, rename_mode, rename_input,
+                            output_dir=output_dir if source_kind == 'folder' else None,
+                            output_format=output_format if source_kind == 'upload' else None
                         )
-                        
-                        # Update progress
-                        progress_bar.progress(50)
-                        status_text.text("リネーム処理完了、ZIPファイルを作成中...")
-                        
-                        # Create ZIP file
-                        with open('renamed_images.zip', 'wb') as zipf:
-                            shutil.make_archive('renamed_images', 'zip', 'renamed_images')
-                        
-                        # Complete progress
-                        progress_bar.progress(100)
-                        status_text.text("処理完了！")
-                        
-                        # Display download button
-                        with open("renamed_images.zip", "rb") as file:
-                            st.download_button(
-                                label="ZIPファイルをダウンロード",
-                                data=file,
-                                file_name="renamed_images.zip",
-                                mime="application/zip"
-                            )
-                        
-                        # Display results
-                        st.subheader("リネーム結果")
-                        for original, new_name in rename_results.items():
-                            st.write(f"{original} → {new_name}")
                     else:
                         st.error("リネーム名を入力してください")
                 
-            # Find the selected image file
-            selected_image = next((f for f in st.session_state.uploaded_files if f.name == selected_image_name), None)
-            
+                # Undo the last in-place batch
+                last_journal = st.session_state.get('last_journal')
+                if source_kind == 'folder' and last_journal:
+                    if st.button("直前のリネームを元に戻す", key="undo_last_batch"):
+                        journal = RenameJournal.load(last_journal)
+                        restored = journal.rollback(on_rename=image_source.renamed)
+                        st.session_state.pop('last_journal', None)
+                        st.session_state.pop('selected_image', None)
+                        st.session_state.pop('batch_names', None)
+                        success_after_rerun(f"{restored} 件を元に戻しました")
+                        st.rerun()
+                
             with col_preview:
                 st.subheader("画像プレビュー")
                 
                 if selected_image:
-                    # Initialize image cache if needed
-                    if 'image_cache' not in st.session_state:
-                        st.session_state.image_cache = {}
-                        
-                    # Cache images for better performance
-                    if selected_image_name not in st.session_state.image_cache:
-                        # Load and process image
-                        image = Image.open(selected_image)
-                        img_byte_arr = io.BytesIO()
-                        image.save(img_byte_arr, format=image.format if image.format else 'JPEG')
-                        st.session_state.image_cache[selected_image_name] = img_byte_arr.getvalue()
+                    # Bounded cache of downscaled previews
+                    if 'thumbnail_cache' not in st.session_state:
+                        st.session_state.thumbnail_cache = ThumbnailCache()
+                    thumbnail_cache = st.session_state.thumbnail_cache
+                    
+                    try:
+                        with selected_image.open() as image_file:
+                            thumbnail = thumbnail_cache.get_or_create(selected_image.thumbnail, image_file)
+                    except Exception as e:
+                        # A broken or unusual file must not take the whole tab down
+                        thumbnail = None
+                        st.warning(f"プレビューを表示できません: {e}")
                     
                     # Display image
-                    st.image(
-                        st.session_state.image_cache[selected_image_name], 
-                        caption=selected_image_name, 
-                        use_column_width=True
+                    if thumbnail is not None:
+                        st.image(
+                            thumbnail, 
+                            caption=selected_image.name, 
+                            use_column_width=True
+                        )
+                    
+                    stats = thumbnail_cache.stats()
+                    st.caption(
+                        f"プレビューキャッシュ: ヒット {stats.hits} / ミス {stats.misses} / "
+                        f"破棄 {stats.evictions} ({stats.bytes / 1024 / 1024:.1f}/"
+                        f"{stats.budget / 1024 / 1024:.0f} MB)"
+                    )
+            
+            # Batch metadata index of the whole upload set
+            st.header("📊 メタデータ一括解析")
+            index_job = st.session_state.get('index_job')
+            
+            if st.button("全画像のメタデータを解析", disabled=bool(index_job and index_job.running)):
+                discard_index_job()
+                index_job = renamer.start_index_job(image_source.paths(), ids=image_source.ids())
+                st.session_state.index_job = index_job
+                st.session_state.keyword_index = KeywordIndex()
+            
+            if index_job:
+                st.progress(index_job.done / max(index_job.total, 1))
+                st.write(f"{index_job.done}/{index_job.total} 枚解析済み (エラー {index_job.errors} 件)")
+                if index_job.error:
+                    st.error(f"解析を中断しました。未解析の画像はエラーとして扱います: {index_job.error}")
+                with st.expander("解析結果", expanded=index_job.finished):
+                    st.dataframe(index_job.table(), use_container_width=True)
+            
+            # Per-image names from the metadata index, previewed before anything is written
+            st.header("🏷️ 画像ごとの自動命名")
+            batch_pattern = st.text_input(
+                "命名テンプレート",
+                value=BATCH_NAME_TEMPLATE,
+                key="batch_template_input",
+                help="{big} / {small}: 画像のキーワードのうち登録済みのビッグワード / スモールワード、"
+                     "{mapped:3}: マッピングされたキーワード (先頭3件)、{extracted}: 抽出されたキーワード、"
+                     "{stem}: 元のファイル名、{n:03d}: 連番"
+            )
+            try:
+                NameTemplate(batch_pattern)
+                batch_error = None
+            except TemplateError as e:
+                batch_error = str(e)
+                st.error(f"テンプレートが不正です: {e}")
+            
+            batch_convert = source_kind == 'upload' and rename_mode == 'convert'
+            # The catalog version changes with every added, renamed or removed file
+            batch_key = (batch_pattern, image_source.catalog.version, renamer.settings_version, rename_mode,
+                         output_format if batch_convert else None)
+            # An index extracted with older keywords or mappings is not used
+            index_current = bool(index_job) and renamer.index_is_current(index_job)
+            if index_job and not index_current:
+                st.caption("キーワード設定が変更されたため、解析結果は使わずに画像ごとに読み直します。再解析すると高速になります")
+            elif not (index_job and index_job.finished):
+                st.caption("先に「全画像のメタデータを解析」を実行すると、解析済みのキーワードを使って高速に命名できます")
+            
+            if st.button("名前を生成してプレビュー", disabled=batch_error is not None):
+                keywords_by_id = index_job.keywords_by_id() if index_current else {}
+                with st.spinner("名前を生成しています..."):
+                    pairs = renamer.plan_batch_names(
+                        image_source.paths(),
+                        batch_pattern,
+                        [keywords_by_id.get(record_id) for record_id in image_source.ids()],
+                        mode='convert' if batch_convert else 'copy',
+                        output_format=output_format if batch_convert else None
+                    )
+                st.session_state.batch_names = {
+                    'key': batch_key,
+                    'pairs': pairs,
+                    'changed': sum(1 for file, name in pairs if os.path.basename(file) != name),
+                }
+                st.session_state.batch_preview_page = 1
+            
+            batch_names = st.session_state.get('batch_names')
+            if batch_names:
+                pairs = batch_names['pairs']
+                preview_pages = max(1, (len(pairs) - 1) // PREVIEW_PAGE_SIZE + 1)
+                col_preview_page, col_preview_info = st.columns([1, 3])
+                with col_preview_page:
+                    preview_page = st.number_input(
+                        "プレビューのページ",
+                        min_value=1,
+                        max_value=preview_pages,
+                        key="batch_preview_page"
+                    )
+                with col_preview_info:
+                    st.info(f"{len(pairs)} 枚中 {batch_names['changed']} 枚の名前が変わります (全 {preview_pages} ページ)")
+                
+                start = (preview_page - 1) * PREVIEW_PAGE_SIZE
+                st.dataframe(
+                    [
+                        {'元のファイル名': os.path.basename(file), '新しいファイル名': name}
+                        for file, name in pairs[start:start + PREVIEW_PAGE_SIZE]
+                    ],
+                    use_container_width=True
+                )
+                
+                if batch_names['key'] != batch_key:
+                    st.warning("テンプレート・画像・設定が変更されました。プレビューを作り直してください")
+                elif st.button("この名前でリネームを実行", type="primary"):
+                    run_rename(
+                        renamer, image_source, source_kind, rename_mode, batch_pattern,
+                        output_dir=output_dir if source_kind == 'folder' else None,
+                        output_format=output_format if source_kind == 'upload' else None,
+                        pairs=pairs
                     )
 
     with tab2:
@@ -293,16 +686,15 @@ def main():
                     st.text(template)
                 with col_delete:
                     if st.button("削除", key=f"del_template_{idx}"):
-                        st.session_state.settings['template_texts'].pop(idx)
-                        renamer.save_settings()
-                        st.experimental_rerun()
+                        renamer.remove_word('template_texts', idx)
+                        st.rerun()
         
         with col2:
             st.subheader("新規定型文登録")
             new_template = st.text_input("新しい定型文")
             if st.button("追加", key="add_template"):
                 renamer.add_word('template_texts', new_template)
-                st.experimental_rerun()
+                st.rerun()
 
     with tab3:
         st.header("🔍 検索ワード管理")
@@ -319,15 +711,14 @@ def main():
                     st.text(word)
                 with col_delete:
                     if st.button("削除", key=f"del_big_{idx}"):
-                        st.session_state.settings['big_words'].pop(idx)
-                        renamer.save_settings()
-                        st.experimental_rerun()
+                        renamer.remove_word('big_words', idx)
+                        st.rerun()
             
             # Add new big word
             new_big_word = st.text_input("新しいビッグワード")
             if st.button("追加", key="add_big"):
                 renamer.add_word('big_words', new_big_word)
-                st.experimental_rerun()
+                st.rerun()
         
         with col2:
             st.subheader("スモールワード")
@@ -339,15 +730,14 @@ def main():
                     st.text(word)
                 with col_delete:
                     if st.button("削除", key=f"del_small_{idx}"):
-                        st.session_state.settings['small_words'].pop(idx)
-                        renamer.save_settings()
-                        st.experimental_rerun()
+                        renamer.remove_word('small_words', idx)
+                        st.rerun()
             
             # Add new small word
             new_small_word = st.text_input("新しいスモールワード")
             if st.button("追加", key="add_small"):
                 renamer.add_word('small_words', new_small_word)
-                st.experimental_rerun()
+                st.rerun()
 
     with tab4:
         st.header("📝 メタデータキーワード管理")
@@ -360,16 +750,15 @@ def main():
                 st.text(word)
             with col_delete:
                 if st.button("削除", key=f"del_meta_{idx}"):
-                    st.session_state.settings['metadata_keywords'].pop(idx)
-                    renamer.save_settings()
-                    st.experimental_rerun()
+                    renamer.remove_word('metadata_keywords', idx)
+                    st.rerun()
         
         # Add new metadata keyword
         st.subheader("新規キーワード登録")
         new_metadata = st.text_input("新しいメタデータキーワード")
         if st.button("追加", key="add_meta"):
             renamer.add_word('metadata_keywords', new_metadata)
-            st.experimental_rerun()
+            st.rerun()
 
     with tab5:
         st.header("🔄 キーワードマッピング")
@@ -386,7 +775,7 @@ def main():
                 if st.button("削除", key=f"del_map_{idx}"):
                     del st.session_state.settings['keyword_mappings'][keyword]
                     renamer.save_settings()
-                    st.experimental_rerun()
+                    st.rerun()
         
         # Add new mapping
         st.subheader("新規マッピング登録")
@@ -398,10 +787,16 @@ def main():
             
         if st.button("追加", key="add_mapping"):
             if renamer.add_keyword_mapping(new_keyword, mapped_values):
-                st.success(f"キーワードマッピングを追加しました: {new_keyword}")
-                st.experimental_rerun()
+                success_after_rerun(f"キーワードマッピングを追加しました: {new_keyword}")
+                st.rerun()
             else:
                 st.error("キーワードを入力してください")
 
+    # Keep polling while metadata indexing runs in the background
+    index_job = st.session_state.get('index_job')
+    if index_job and index_job.running:
+        time.sleep(0.5)
+        st.rerun()
+
 if __name__ == "__main__":
     main()
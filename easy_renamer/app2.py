@@ -5,12 +5,84 @@ from PIL.ExifTags import TAGS
 import json
 import tempfile
 import base64
+import html
+from modules.core import SETTINGS_PATH, default_settings, ensure_settings_keys
+from modules.settings_store import get_settings_store
+
+# ワードブロック1ページあたりの表示数
+WORD_BLOCKS_PER_PAGE = 60
+
+WORD_BLOCK_ASSETS = """
+    <style>
+    .word-block {
+        display: inline-block;
+        background-color: #f0f0f0;
+        border: 1px solid #ccc;
+        border-radius: 5px;
+        padding: 5px 10px;
+        margin: 5px;
+        cursor: move;
+    }
+    #rename-input {
+        width: 100%;
+        font-size: 16px;
+        padding: 10px;
+    }
+    </style>
+    <script>
+    function allowDrop(ev) {
+        ev.preventDefault();
+    }
+
+    function drag(ev) {
+        ev.dataTransfer.setData("text", ev.target.innerText);
+    }
+
+    function drop(ev) {
+        ev.preventDefault();
+        var data = ev.dataTransfer.getData("text");
+        var input = document.getElementById("rename-input");
+        var startPos = input.selectionStart;
+        var endPos = input.selectionEnd;
+        
+        // 現在の入力値
+        var currentValue = input.value;
+        
+        // 新しい値を作成
+        var newValue = 
+            currentValue.slice(0, startPos) + 
+            " " + data + " " + 
+            currentValue.slice(endPos);
+        
+        // 値を設定
+        input.value = newValue.replace(/\s+/g, ' ').trim();
+        
+        // Streamlitにイベントを送信
+        const event = new Event('input');
+        input.dispatchEvent(event);
+    }
+    </script>
+    """
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _word_blocks_html(version, page, _words):
+    """1ページ分のワードブロックのHTML (キャッシュキーは設定のバージョンとページ番号)"""
+    return "".join(
+        f'<span class="word-block" draggable="true" ondragstart="drag(event)">{html.escape(word)}</span>'
+        for word in _words
+    )
 
 class EasyRenamer:
     def __init__(self):
+        # 設定ストア (プロセス内で共有、書き込みはまとめて非同期に行う)
+        # app.py と同じファイル・同じ形式の設定を使う
+        self.store = get_settings_store(SETTINGS_PATH, default_settings)
+        self.store.reload_if_changed()
+
         # セッション状態の初期化
-        if 'settings' not in st.session_state:
+        if st.session_state.get('settings') is not self.store.settings:
             self.load_settings()
+        ensure_settings_keys(st.session_state.settings)
         
         # AI生成画像用の追加メタデータキーワード
         self.ai_image_keywords = [
@@ -21,24 +93,14 @@ class EasyRenamer:
 
     def load_settings(self):
         """設定ファイルの読み込み"""
-        try:
-            with open('settings.json', 'r', encoding='utf-8') as f:
-                st.session_state.settings = json.load(f)
-        except FileNotFoundError:
-            st.session_state.settings = {
-                'template_texts': ['出品画像', 'カードゲーム用', 'コレクション'],
-                'big_words': ['キャラクター', '美少女', 'アニメ'],
-                'small_words': ['可愛い', '人気', '高品質'],
-                'registered_words': []
-            }
+        st.session_state.settings = self.store.settings
 
     def save_settings(self):
-        """設定ファイルの保存"""
-        with open('settings.json', 'w', encoding='utf-8') as f:
-            json.dump(st.session_state.settings, f, ensure_ascii=False, indent=4)
+        """設定ファイルの保存 (短い待ち時間の後に一括で書き込む)"""
+        self.store.mark_dirty()
 
     def create_word_blocks(self):
-        """ワードブロックの作成"""
+        """ワードブロックの作成 (1ページ分のみ描画し、HTMLは設定のバージョンごとにキャッシュ)"""
         # 全てのワードを統合
         all_words = (
             st.session_state.settings['template_texts'] + 
@@ -46,63 +108,18 @@ class EasyRenamer:
             st.session_state.settings['small_words']
         )
         
-        # ワードブロックのHTML/CSS
-        st.markdown("""
-        <style>
-        .word-block {
-            display: inline-block;
-            background-color: #f0f0f0;
-            border: 1px solid #ccc;
-            border-radius: 5px;
-            padding: 5px 10px;
-            margin: 5px;
-            cursor: move;
-        }
-        #rename-input {
-            width: 100%;
-            font-size: 16px;
-            padding: 10px;
-        }
-        </style>
-        <script>
-        function allowDrop(ev) {
-            ev.preventDefault();
-        }
-
-        function drag(ev) {
-            ev.dataTransfer.setData("text", ev.target.innerText);
-        }
-
-        function drop(ev) {
-            ev.preventDefault();
-            var data = ev.dataTransfer.getData("text");
-            var input = document.getElementById("rename-input");
-            var startPos = input.selectionStart;
-            var endPos = input.selectionEnd;
-            
-            // 現在の入力値
-            var currentValue = input.value;
-            
-            // 新しい値を作成
-            var newValue = 
-                currentValue.slice(0, startPos) + 
-                " " + data + " " + 
-                currentValue.slice(endPos);
-            
-            // 値を設定
-            input.value = newValue.replace(/\s+/g, ' ').trim();
-            
-            // Streamlitにイベントを送信
-            const event = new Event('input');
-            input.dispatchEvent(event);
-        }
-        </script>
-        """, unsafe_allow_html=True)
-
-        # ワードブロックの表示
-        word_block_html = ""
-        for word in all_words:
-            word_block_html += f'<span class="word-block" draggable="true" ondragstart="drag(event)">{word}</span>'
+        # ワードブロックのHTML/CSS (定数のため毎回組み立てない)
+        st.markdown(WORD_BLOCK_ASSETS, unsafe_allow_html=True)
+
+        # ワードブロックの表示 (ページ単位)
+        total_pages = max(1, (len(all_words) - 1) // WORD_BLOCKS_PER_PAGE + 1)
+        page = 1
+        if total_pages > 1:
+            page = st.number_input("ワードページ", min_value=1, max_value=total_pages, value=1)
+        start = (page - 1) * WORD_BLOCKS_PER_PAGE
+        word_block_html = _word_blocks_html(
+            self.store.version, page, all_words[start:start + WORD_BLOCKS_PER_PAGE]
+        )
         
         st.markdown(f'<div ondrop="drop(event)" ondragover="allowDrop(event)">{word_block_html}</div>', unsafe_allow_html=True)
 
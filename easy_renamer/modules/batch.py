@@ -0,0 +1,114 @@
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Snapshot passed to progress callbacks after every finished file
+BatchProgress = namedtuple(
+    'BatchProgress',
+    ['files_done', 'total_files', 'bytes_done', 'total_bytes', 'errors']
+)
+
+# Outcome of a single item; error is None when func succeeded
+BatchResult = namedtuple('BatchResult', ['item', 'value', 'error'])
+
+
+def default_worker_count():
+    """Number of worker threads used when none is given"""
+    return min(8, os.cpu_count() or 1)
+
+
+def file_size(file):
+    """
+    Return the size in bytes of an uploaded file, file object or path
+    """
+    if isinstance(file, str):
+        return os.path.getsize(file)
+    size = getattr(file, 'size', None)
+    if size is not None:
+        return size
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+class BatchEngine:
+    """
+    Run a function over many files on a bounded thread pool.
+
+    Pillow and zlib release the GIL while encoding and compressing, so
+    per-file work overlaps across cores. At most max_workers * 2 items are
+    in flight, and results are handed back in input order.
+    """
+
+    def __init__(self, max_workers=None, progress_callback=None):
+        self.max_workers = max_workers or default_worker_count()
+        self.progress_callback = progress_callback
+
+    def run(self, func, items, consume=None, size_of=file_size):
+        """
+        Apply func to every item on the pool.
+
+        consume(item, value) is called on the calling thread in input order,
+        which keeps output deterministic and lets it write to objects that
+        are not thread-safe (such as a ZipFile). Progress callbacks also run
+        on the calling thread, so they may update Streamlit widgets.
+
+        An item whose size cannot be read (e.g. a file deleted since it was
+        listed) is reported as failed with that OSError and never passed to func.
+
+        Returns a list of BatchResult in input order.
+        """
+        items = list(items)
+        sizes = []
+        size_errors = {}
+        for index, item in enumerate(items):
+            try:
+                sizes.append(size_of(item))
+            except OSError as e:
+                sizes.append(0)
+                size_errors[index] = e
+        total_bytes = sum(sizes)
+        window = self.max_workers * 2
+
+        results = []
+        files_done = 0
+        bytes_done = 0
+        errors = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            next_index = 0
+
+            while next_index < len(items) or pending:
+                # Keep the pool busy without queueing the whole batch
+                while next_index < len(items) and len(pending) < window:
+                    if next_index in size_errors:
+                        pending.append(None)
+                    else:
+                        pending.append(executor.submit(func, items[next_index]))
+                    next_index += 1
+
+                index = len(results)
+                item = items[index]
+                future = pending.popleft()
+                try:
+                    if future is None:
+                        raise size_errors[index]
+                    value = future.result()
+                    if consume is not None:
+                        consume(item, value)
+                    results.append(BatchResult(item, value, None))
+                except Exception as e:
+                    errors += 1
+                    results.append(BatchResult(item, None, e))
+
+                files_done += 1
+                bytes_done += sizes[index]
+                if self.progress_callback is not None:
+                    self.progress_callback(BatchProgress(
+                        files_done, len(items), bytes_done, total_bytes, errors
+                    ))
+
+        return results
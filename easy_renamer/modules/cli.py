@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import sys
+
+from modules.core import BATCH_NAME_TEMPLATE, CONVERT_EXTENSIONS, SETTINGS_PATH, RenamerCore, load_settings
+from modules.name_template import NameTemplate, TemplateError
+from src.folder_index import SUPPORTED_EXTENSIONS
+
+# Print a progress line every this many files
+PROGRESS_INTERVAL = 1000
+
+
+def collect_files(paths, recursive=False):
+    """
+    Expand directories into the image files they contain, sorted by name
+    so numbering is stable from run to run. Files are kept in the given order.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        found = []
+        stack = [path]
+        while stack:
+            with os.scandir(stack.pop()) as iterator:
+                for entry in iterator:
+                    if entry.is_dir():
+                        if recursive:
+                            stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS:
+                        found.append(entry.path)
+        found.sort()
+        files.extend(found)
+    return files
+
+
+def _print_progress(progress):
+    if progress.files_done % PROGRESS_INTERVAL == 0 or progress.files_done == progress.total_files:
+        print(f"{progress.files_done}/{progress.total_files} 件 "
+              f"({progress.bytes_done // (1024 * 1024)}/{progress.total_bytes // (1024 * 1024)} MB, "
+              f"エラー {progress.errors} 件)", file=sys.stderr)
+
+
+def _report(message):
+    print(message, file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Easy Renamer のコマンドライン版")
+    parser.add_argument('--settings', default=SETTINGS_PATH, help="設定JSONファイル (アプリと同じ形式)")
+    parser.add_argument('--workers', type=int, help="並列数")
+    parser.add_argument('-r', '--recursive', action='store_true', help="サブフォルダも対象にする")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rename_parser = subparsers.add_parser('rename', help="リネームしたコピーを出力")
+    rename_parser.add_argument('inputs', nargs='+', help="画像ファイルまたはフォルダ")
+    naming = rename_parser.add_mutually_exclusive_group(required=True)
+    naming.add_argument('--text', help="リネーム名")
+    naming.add_argument('--template', help=f"画像ごとの命名テンプレート (例: \"{BATCH_NAME_TEMPLATE}\")")
+    rename_parser.add_argument('--numbering', default="{n:02d}", help="連番形式")
+    rename_parser.add_argument('--position', choices=('prefix', 'suffix'), default='suffix', help="連番の位置")
+    rename_parser.add_argument('--start', type=int, default=1, help="開始番号")
+    rename_parser.add_argument('--mode', choices=('copy', 'convert', 'link'), default='copy',
+                               help="出力モード (link: ハードリンク、別ボリュームではコピー。--zip とは併用不可)")
+    rename_parser.add_argument('--format', choices=sorted(CONVERT_EXTENSIONS), help="convert モードの出力形式")
+    output = rename_parser.add_mutually_exclusive_group()
+    output.add_argument('--output', default='renamed_images', help="出力フォルダ")
+    output.add_argument('--zip', help="出力するZIPファイルのパス")
+
+    keywords_parser = subparsers.add_parser('keywords', help="メタデータキーワードを JSON Lines で出力")
+    keywords_parser.add_argument('inputs', nargs='+', help="画像ファイルまたはフォルダ")
+
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    core = RenamerCore(settings, report=_report)
+    files = collect_files(args.inputs, args.recursive)
+    if not files:
+        _report("対象の画像がありません")
+        return 1
+
+    if args.command == 'keywords':
+        job = core.start_index_job(files, args.workers)
+        job.join()
+        for path, record in zip(files, job.records):
+            print(json.dumps({
+                'file': path,
+                'digest': record.digest,
+                'extracted': record.extracted,
+                'mapped': record.mapped,
+                'error': record.error,
+            }, ensure_ascii=False))
+        return 1 if job.errors else 0
+
+    if args.mode == 'convert' and args.format is None:
+        parser.error("--mode convert には --format が必要です")
+    if args.mode == 'link' and args.zip:
+        parser.error("--mode link は --zip と併用できません (ZIP には常にファイルの中身が書き込まれます)")
+
+    pairs = None
+    if args.template:
+        try:
+            NameTemplate(args.template)
+        except TemplateError as e:
+            parser.error(f"--template が不正です: {e}")
+        # Index every file's keywords in parallel, then name the batch in one pass
+        job = core.start_index_job(files, args.workers)
+        job.join()
+        keywords = [
+            (record.extracted, record.mapped) if record is not None and record.error is None else None
+            for record in job.records
+        ]
+        pairs = core.plan_batch_names(files, args.template, keywords, args.mode, args.format, start=args.start)
+
+    options = dict(
+        custom_numbering=args.numbering,
+        position=args.position,
+        mode=args.mode,
+        output_format=args.format,
+        progress_callback=_print_progress,
+        max_workers=args.workers,
+        start=args.start,
+        pairs=pairs,
+    )
+    if args.zip:
+        with open(args.zip, 'wb') as archive:
+            _, results = core.create_archive(files, args.text, archive=archive, **options)
+    else:
+        results = core.rename_files(files, args.text, args.output, **options)
+
+    print(f"{len(results)}/{len(files)} 件を出力しました", file=sys.stderr)
+    return 0 if len(results) == len(files) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
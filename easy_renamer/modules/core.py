@@ -0,0 +1,499 @@
+import os
+import json
+import copy
+import importlib
+import shutil
+import logging
+import zipfile
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from PIL import Image
+from modules.batch import BatchEngine, file_size
+from modules.indexer import IndexJob, extract_keywords
+from modules.metadata_cache import settings_version
+from modules.name_template import NameTemplate, TemplateError, safe_filename
+from src.backup import create_backup
+from src.rename_journal import run_batch
+from src.rename_planner import plan_renames, unique_names
+
+# Chunk size used when streaming original bytes to a renamed file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Pillow format name -> file extension used by the 'convert' mode
+CONVERT_EXTENSIONS = {
+    'PNG': '.png',
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+}
+
+# Already-compressed formats are stored in the ZIP without deflating again
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+
+# Converted images larger than this are spooled to disk before zipping
+CONVERT_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Application config shared with the folder-mode tool (the module name has a hyphen)
+AppConfig = importlib.import_module('src.config-module').AppConfig
+
+# Settings shared by the app and the command-line tool
+SETTINGS_PATH = 'settings.json'
+
+# Most filesystems limit a name to 255 bytes
+DEFAULT_MAX_FILENAME_LENGTH = 255
+
+DEFAULT_SETTINGS = {
+    'template_texts': ["新品 正規品", "送料無料", "即決", "即購入OK"],
+    'big_words': ["アート", "イラスト", "原画", "絵画", "AI絵画"],
+    'small_words': ["風景", "美女", "美人", "廃墟", "SF", "ファンタジー"],
+    'metadata_keywords': ["masterpiece", "best quality", "ultra detailed", "8k", "highres"],
+    'keyword_mappings': {
+        "masterpiece": ["傑作", "名作"],
+        "best quality": ["最高品質"],
+        "ultra detailed": ["超高詳細"],
+        "8k": ["高解像度"],
+        "highres": ["高解像度"],
+    }
+}
+
+# Default template of the per-image batch naming mode
+BATCH_NAME_TEMPLATE = "{big} {mapped:3} {small} {n:03d}"
+
+logger = logging.getLogger(__name__)
+
+
+def load_app_config():
+    """
+    The AppConfig for config/config-json.json, read on every call so a
+    backup strategy changed in the folder-mode tool applies here too
+    """
+    return AppConfig()
+
+
+def default_settings():
+    """A fresh copy of the default settings"""
+    return copy.deepcopy(DEFAULT_SETTINGS)
+
+
+def ensure_settings_keys(settings):
+    """Ensure all required settings keys exist"""
+    for key in DEFAULT_SETTINGS:
+        if key not in settings:
+            settings[key] = {} if key == 'keyword_mappings' else []
+    return settings
+
+
+def load_settings(path):
+    """
+    Load a settings JSON file (the same shape as the app's settings).
+    Returns the default settings when the file does not exist.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    except FileNotFoundError:
+        return default_settings()
+    return ensure_settings_keys(settings)
+
+
+def source_name(file):
+    """File name of an uploaded file object or a path"""
+    return os.path.basename(file) if isinstance(file, str) else file.name
+
+
+def source_key(file):
+    """Key used in result dicts: the path for files on disk, otherwise the upload name"""
+    return file if isinstance(file, str) else file.name
+
+
+@contextmanager
+def open_source(file):
+    """
+    Yield a readable binary file object for an uploaded file or a path.
+    Paths are opened only for the duration of the block, so a batch of
+    hundreds of thousands of files never holds more than a few descriptors.
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            yield f
+    else:
+        file.seek(0)
+        yield file
+
+
+class RenamerCore:
+    """
+    Renaming, metadata and keyword-mapping logic without any Streamlit dependency.
+
+    Files may be uploaded file objects (anything with name, seek and read)
+    or paths on disk. Problems that do not stop a batch are passed to
+    report(message); by default they are logged.
+    """
+
+    def __init__(self, settings, report=None, max_filename_length=None):
+        self.settings = ensure_settings_keys(settings)
+        self.report = report or logger.error
+        self.max_filename_length = max_filename_length or load_app_config().get(
+            'max_filename_length', DEFAULT_MAX_FILENAME_LENGTH
+        )
+
+    def add_word(self, category, word):
+        """Add a word to a category"""
+        if word and word.strip():
+            if word not in self.settings[category]:
+                self.settings[category].append(word.strip())
+                return True
+        return False
+
+    def add_keyword_mapping(self, keyword, mapped_values):
+        """Add a keyword mapping"""
+        if keyword and keyword.strip():
+            # Split mapped values by comma and strip whitespace
+            values = [v.strip() for v in mapped_values.split(',') if v.strip()]
+            self.settings['keyword_mappings'][keyword.strip()] = values
+            return True
+        return False
+
+    def extract_metadata_keywords(self, image_file):
+        """
+        Extract keywords from image metadata, especially for Stable Diffusion generated images.
+        Returns a dictionary with extracted and mapped keywords.
+        """
+        try:
+            # Served from the shared content-addressed cache when possible
+            with open_source(image_file) as f:
+                _, result = extract_keywords(
+                    f,
+                    self.settings['metadata_keywords'],
+                    self.settings['keyword_mappings']
+                )
+            return result
+        except Exception as e:
+            self.report(f"メタデータの抽出中にエラーが発生しました: {e}")
+            return {'extracted': [], 'mapped': []}
+
+    def index_is_current(self, job):
+        """
+        True if job extracted its keywords with the current metadata
+        keywords and mappings; otherwise its rows are stale
+        """
+        return job.version == settings_version(self.settings['metadata_keywords'], self.settings['keyword_mappings'])
+
+    def start_index_job(self, files, max_workers=None, ids=None):
+        """
+        Start extracting metadata keywords for all files on a process pool.
+        ids optionally gives an id per file (see IndexJob.ids).
+        Returns the running IndexJob.
+        """
+        return IndexJob(
+            files,
+            self.settings['metadata_keywords'],
+            self.settings['keyword_mappings'],
+            max_workers=max_workers,
+            ids=ids
+        ).start()
+
+    def rename_files(self, files, rename_pattern, output_dir, custom_numbering="{n:02d}", position='suffix',
+                     mode='copy', output_format=None, progress_callback=None, max_workers=None, start=1,
+                     link_strategy='auto', pairs=None):
+        """
+        Write renamed copies of files to output_dir
+
+        mode='copy' streams the original bytes to the new name, so metadata
+        and compression are kept as-is. mode='convert' decodes the image and
+        re-encodes it as output_format ('PNG', 'JPEG' or 'WEBP').
+        mode='link' (paths only) hardlinks into output_dir, falling back to
+        a reflink or a copy across volumes; no image data is read.
+        Names already present in output_dir are never overwritten.
+        Files are processed in parallel; progress_callback receives a
+        BatchProgress after each file.
+        pairs, e.g. from plan_batch_names, gives every (file, new_filename)
+        up front; files and the naming arguments are then ignored. A given
+        name that would leave output_dir raises ValueError.
+        """
+        self._check_mode(mode, output_format)
+        os.makedirs(output_dir, exist_ok=True)
+        if pairs is None:
+            pairs = self.plan_filenames(files, rename_pattern, custom_numbering, position, mode, output_format,
+                                        occupied=os.listdir(output_dir), start=start)
+        else:
+            sources = [file for file, _ in pairs]
+            names = [self._name_in_folder(output_dir, name) for _, name in pairs]
+            pairs = list(zip(sources, unique_names(
+                names, os.listdir(output_dir), max_bytes=self.max_filename_length
+            )))
+
+        def save(entry):
+            file, new_filename = entry
+            save_path = os.path.join(output_dir, new_filename)
+            if mode == 'convert':
+                self._convert_file(file, save_path, output_format)
+            elif mode == 'link':
+                if not isinstance(file, str):
+                    raise ValueError("link モードはフォルダ内のファイルのみ対応しています")
+                create_backup(file, save_path, link_strategy)
+            else:
+                self._copy_file(file, save_path)
+
+        engine = BatchEngine(max_workers, progress_callback)
+        batch = engine.run(save, pairs, size_of=lambda entry: file_size(entry[0]))
+        return self._collect_results(batch)
+
+    def rename_in_place(self, folder, names, rename_pattern, custom_numbering="{n:02d}", position='suffix',
+                        on_rename=None, start=1, pairs=None):
+        """
+        Rename files inside folder without copying them
+
+        Names are planned against everything else in the folder, swaps and
+        cycles go through temporary names, and the batch is journaled so it
+        can be rolled back (see src/rename_journal.py). pairs works as in
+        rename_files (paths inside folder).
+        Raises ValueError, before anything is renamed, when a new name
+        would leave the folder.
+        Returns (plan, journal).
+        """
+        if pairs is None:
+            files = [os.path.join(folder, name) for name in names]
+            pairs = self.plan_filenames(files, rename_pattern, custom_numbering, position, 'copy', None,
+                                        start=start)
+        plan = plan_renames(
+            [(os.path.basename(file), self._name_in_folder(folder, new_filename)) for file, new_filename in pairs],
+            os.listdir(folder),
+            max_bytes=self.max_filename_length
+        )
+        journal = run_batch(folder, plan.steps, on_rename=on_rename)
+        return plan, journal
+
+    @staticmethod
+    def _name_in_folder(folder, new_filename):
+        """
+        Make new_filename a plain name and check that it stays inside folder
+        (rename does not follow the last component, so its parent is resolved)
+        """
+        name = safe_filename(new_filename)
+        target = os.path.join(folder, name)
+        if not name or os.path.realpath(os.path.dirname(target)) != os.path.realpath(folder):
+            raise ValueError(f"New name leaves the folder: {new_filename}")
+        return name
+
+    def create_archive(self, files, rename_pattern, custom_numbering="{n:02d}", position='suffix',
+                       mode='copy', output_format=None, progress_callback=None, max_workers=None,
+                       archive=None, start=1, pairs=None):
+        """
+        Build a ZIP archive of the renamed files directly from the sources.
+        Returns (archive, results); archive is a temporary file positioned at
+        the start unless an open binary file is passed in.
+        In 'convert' mode images are re-encoded in parallel and written to the
+        archive in input order. pairs works as in rename_files.
+        'link' mode raises ValueError: archive members are always full copies.
+        """
+        self._check_mode(mode, output_format)
+        if mode == 'link':
+            raise ValueError("link mode cannot write an archive")
+        if pairs is None:
+            pairs = self.plan_filenames(files, rename_pattern, custom_numbering, position, mode, output_format,
+                                        start=start)
+        else:
+            # A '/' in a member name would extract into a subdirectory
+            pairs = [(file, safe_filename(name)) for file, name in pairs]
+
+        # Spool to disk so only a few members are held in memory at a time
+        if archive is None:
+            archive = tempfile.TemporaryFile()
+
+        with zipfile.ZipFile(archive, 'w', allowZip64=True) as zipf:
+            def prepare(entry):
+                file, _ = entry
+                if mode != 'convert':
+                    return file
+                # Encode before the member is opened so a failure leaves no partial entry
+                encoded = tempfile.SpooledTemporaryFile(max_size=CONVERT_SPOOL_SIZE)
+                try:
+                    self._convert_file(file, encoded, output_format)
+                except Exception:
+                    encoded.close()
+                    raise
+                return encoded
+
+            def write(entry, source):
+                _, new_filename = entry
+                try:
+                    self._write_archive_member(zipf, source, new_filename)
+                finally:
+                    if source is not entry[0]:
+                        source.close()
+
+            engine = BatchEngine(max_workers, progress_callback)
+            batch = engine.run(prepare, pairs, consume=write, size_of=lambda entry: file_size(entry[0]))
+
+        archive.seek(0)
+        return archive, self._collect_results(batch)
+
+    def _collect_results(self, batch):
+        """
+        Turn engine results into {original: new_filename}, reporting failures
+        """
+        results = {}
+        failures = []
+        for (file, new_filename), _, error in batch:
+            if error is None:
+                results[source_key(file)] = new_filename
+            else:
+                failures.append(f"{source_name(file)} ({error})")
+
+        # Report once per batch rather than once per file
+        if failures:
+            shown = ", ".join(failures[:5])
+            more = f" ほか {len(failures) - 5} 件" if len(failures) > 5 else ""
+            self.report(f"{len(failures)} 件のファイルの処理中にエラーが発生しました: {shown}{more}")
+        return results
+
+    def _check_mode(self, mode, output_format):
+        """Validate the rename mode and output format"""
+        if mode not in ('copy', 'convert', 'link'):
+            raise ValueError(f"Unknown rename mode: {mode}")
+        if mode == 'convert' and output_format not in CONVERT_EXTENSIONS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+    def compile_name_template(self, rename_pattern, custom_numbering, position):
+        """
+        Compile the rename text and numbering format into a NameTemplate.
+        Raises TemplateError when the numbering format is invalid.
+        """
+        return NameTemplate.from_numbering(custom_numbering, rename_pattern, position)
+
+    def sample_filename(self, rename_pattern, custom_numbering, position, original_name):
+        """
+        Render the name the first file would get, before truncation,
+        so the UI can show its length against max_filename_length
+        """
+        stem, ext = os.path.splitext(original_name)
+        try:
+            template = self.compile_name_template(rename_pattern, custom_numbering, position)
+        except TemplateError:
+            template = self.compile_name_template(rename_pattern, "{n:02d}", position)
+        context = {'n': 1, 'text': rename_pattern, 'stem': stem, 'date': datetime.now(), 'keywords': []}
+        return template.render(context) + ext
+
+    def plan_filenames(self, files, rename_pattern, custom_numbering, position, mode, output_format,
+                       occupied=(), start=1):
+        """
+        Return a list of (file, new_filename) pairs in input order; names are unique
+        (also against occupied) and fit max_filename_length in UTF-8 bytes
+        """
+        # Compile once per batch; an invalid format is reported once, not per file
+        try:
+            template = self.compile_name_template(rename_pattern, custom_numbering, position)
+        except TemplateError as e:
+            self.report(f"連番形式が不正なため既定の形式 {{n:02d}} を使用します: {e}")
+            template = self.compile_name_template(rename_pattern, "{n:02d}", position)
+
+        now = datetime.now()
+        contexts = []
+        extensions = []
+        for i, file in enumerate(files, start):
+            stem, ext = os.path.splitext(source_name(file))
+
+            # Get the file extension
+            if mode == 'convert':
+                ext = CONVERT_EXTENSIONS[output_format]
+            extensions.append(ext)
+
+            context = {'n': i, 'text': rename_pattern, 'stem': stem, 'date': now}
+            if 'keywords' in template.fields:
+                context['keywords'] = self.extract_metadata_keywords(file).get('mapped', [])
+            contexts.append(context)
+
+        names, errors = template.render_batch(contexts, extensions, self.max_filename_length)
+        if errors:
+            self.report(f"{len(errors)} 件のファイル名の作成中にエラーが発生しました: {errors[0][1]}")
+
+        # Duplicate names (e.g. a numbering format without {n}) get " (2)" suffixes
+        return list(zip(files, unique_names(names, occupied, max_bytes=self.max_filename_length)))
+
+    def plan_batch_names(self, files, pattern, keywords=None, mode='copy', output_format=None,
+                         occupied=(), start=1, text=''):
+        """
+        Name every file from its own metadata with one compiled template,
+        e.g. "{big} {mapped:3} {small} {n:03d}".
+
+        keywords holds (extracted, mapped) per file, e.g. from a finished
+        IndexJob; files without an entry (None) are read through
+        extract_metadata_keywords. {big} and {small} are the file's keywords
+        that are registered big / small words; keywords placed by them are
+        left out of {mapped} and {extracted} so no word appears twice.
+        Raises TemplateError when the pattern is invalid.
+        Returns a list of (file, new_filename) pairs like plan_filenames.
+        """
+        template = NameTemplate(pattern)
+        fields = template.fields
+        big_words = frozenset(self.settings['big_words']) if 'big' in fields else frozenset()
+        small_words = frozenset(self.settings['small_words']) if 'small' in fields else frozenset()
+        placed_words = big_words | small_words
+        wants_keywords = bool(fields & {'keywords', 'mapped', 'extracted', 'big', 'small'})
+
+        now = datetime.now()
+        contexts = []
+        extensions = []
+        for i, file in enumerate(files):
+            stem, ext = os.path.splitext(source_name(file))
+            if mode == 'convert':
+                ext = CONVERT_EXTENSIONS[output_format]
+            extensions.append(ext)
+
+            context = {'n': start + i, 'text': text, 'stem': stem, 'date': now}
+            if wants_keywords:
+                entry = keywords[i] if keywords is not None else None
+                if entry is None:
+                    result = self.extract_metadata_keywords(file)
+                    entry = (result.get('extracted', []), result.get('mapped', []))
+                extracted, mapped = entry
+                context['keywords'] = mapped
+                if placed_words:
+                    # Mapped words first: they are the ones written for listings
+                    ordered = list(dict.fromkeys([*mapped, *extracted]))
+                    context['big'] = [word for word in ordered if word in big_words]
+                    context['small'] = [word for word in ordered if word in small_words]
+                    mapped = [word for word in mapped if word not in placed_words]
+                    extracted = [word for word in extracted if word not in placed_words]
+                context['mapped'] = mapped
+                context['extracted'] = extracted
+            contexts.append(context)
+
+        names, errors = template.render_batch(contexts, extensions, self.max_filename_length, collapse_spaces=True)
+        if errors:
+            self.report(f"{len(errors)} 件のファイル名の作成中にエラーが発生しました: {errors[0][1]}")
+        return list(zip(files, unique_names(names, occupied, max_bytes=self.max_filename_length)))
+
+    def _write_archive_member(self, zipf, source, arcname):
+        """
+        Stream one file into the archive, storing already-compressed formats as-is
+        """
+        _, ext = os.path.splitext(arcname)
+        info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_STORED if ext.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+        with open_source(source) as f, zipf.open(info, 'w', force_zip64=True) as member:
+            shutil.copyfileobj(f, member, COPY_CHUNK_SIZE)
+
+    def _copy_file(self, file, save_path):
+        """
+        Stream the original bytes to save_path without decoding the image
+        """
+        if isinstance(file, str):
+            # Lets the OS copy in-kernel where it can
+            shutil.copyfile(file, save_path)
+            return
+        file.seek(0)
+        with open(save_path, 'wb') as out:
+            shutil.copyfileobj(file, out, COPY_CHUNK_SIZE)
+
+    def _convert_file(self, file, save_path, output_format):
+        """
+        Decode the image and re-encode it in output_format.
+        save_path may be a path or a writable file object.
+        """
+        with open_source(file) as f, Image.open(f) as image:
+            if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(save_path, format=output_format)
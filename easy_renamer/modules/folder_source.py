@@ -0,0 +1,70 @@
+import os
+
+from modules.upload_catalog import UploadCatalog
+from src.folder_index import FolderIndex
+
+
+class FolderSource:
+    """
+    Images in a server-side folder, with the same interface app.py uses
+    for UploadStore (len, page, get, find, paths).
+
+    The folder is scanned once with os.scandir and registered in an
+    UploadCatalog in name order; image bytes are read only when a file is
+    previewed, analysed or renamed.
+    """
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.index = FolderIndex(self.folder)
+        self.catalog = UploadCatalog()
+        self.rescan()
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def page(self, page, page_size, sort='added', reverse=False, subset=None):
+        """Records for one page of the list (page is 1-based, 'added' is name order)"""
+        return self.catalog.page(page, page_size, sort, reverse, subset)
+
+    def get(self, record_id):
+        """Return the record with the given id, or None"""
+        return self.catalog.get(record_id)
+
+    def find(self, name):
+        """Return the record for name, or None"""
+        return self.catalog.find(name)
+
+    def label(self, record):
+        return self.catalog.label(record)
+
+    def ids(self):
+        """Record ids in name order, aligned with paths()"""
+        return [record.id for record in self.catalog.records('name')]
+
+    def names(self):
+        """File names in name order"""
+        return [record.name for record in self.catalog.records('name')]
+
+    def paths(self):
+        """File paths in name order"""
+        return [record.path for record in self.catalog.records('name')]
+
+    def total_size(self):
+        return self.catalog.total_size()
+
+    def renamed(self, old_name, new_name):
+        """Update the index after a rename (usable as an on_rename callback)"""
+        self.index.rename(old_name, new_name)
+        record = self.catalog.find(old_name)
+        if record is not None:
+            self.catalog.rename(record.id, new_name, os.path.join(self.folder, new_name))
+
+    def rescan(self):
+        """Scan the folder again; records get new ids"""
+        self.index.scan()
+        self.catalog.clear()
+        for entry in self.index.page(1, max(len(self.index), 1)):
+            path = os.path.join(self.folder, entry.name)
+            # The mtime keeps cached previews from outliving a changed file
+            self.catalog.add(entry.name, path, entry.size, f"{path}:{entry.mtime}")
@@ -0,0 +1,187 @@
+import json
+import re
+
+# "Key: value" pairs on the A1111 settings line; values may be quoted
+A1111_PARAM_RE = re.compile(r'\s*(\w[\w \-/]+):\s*("(?:\\.|[^\\"])+"|[^,]*)(?:,|$)')
+
+NEGATIVE_PREFIX = 'Negative prompt:'
+
+# Keys exposed in the structured result
+GENERATION_FIELDS = ('positive', 'negative', 'steps', 'seed', 'model', 'cfg_scale', 'sampler', 'source')
+
+# Input names that hold prompt text in ComfyUI text-encode nodes
+COMFY_TEXT_INPUTS = ('text', 'text_g', 'text_l', 'string', 'value')
+
+
+def parse_generation_info(texts):
+    """
+    Parse generation parameters from metadata texts in one pass.
+
+    Handles the A1111 'parameters' string (PNG text chunk or EXIF
+    UserComment) and the ComfyUI 'prompt' graph. The ComfyUI 'workflow'
+    chunk is only decoded when no 'prompt' chunk exists. Returns a dict
+    with GENERATION_FIELDS, or None when no generation info is found.
+    """
+    parameters = texts.get('parameters') or texts.get('UserComment')
+    if parameters and 'Steps:' in parameters:
+        return parse_a1111_parameters(parameters)
+
+    if 'prompt' in texts:
+        info = parse_comfyui_prompt(texts['prompt'])
+        if info:
+            return info
+
+    if 'workflow' in texts:
+        info = parse_comfyui_workflow(texts['workflow'])
+        if info:
+            return info
+
+    if parameters:
+        # Prompt text without a settings line
+        return parse_a1111_parameters(parameters)
+    return None
+
+
+def _empty_info(source):
+    info = dict.fromkeys(GENERATION_FIELDS)
+    info['source'] = source
+    info['positive'] = ''
+    info['negative'] = ''
+    return info
+
+
+def parse_a1111_parameters(text):
+    """
+    Split an A1111 parameters string into prompt, negative prompt and settings
+    """
+    info = _empty_info('a1111')
+    lines = text.strip().split('\n')
+
+    # The last line holds "Steps: 20, Sampler: ..., Seed: ..." when present
+    settings = {}
+    if lines and lines[-1].lstrip().startswith('Steps:'):
+        settings = {key.strip(): value.strip().strip('"') for key, value in A1111_PARAM_RE.findall(lines.pop())}
+
+    positive, negative = [], []
+    target = positive
+    for line in lines:
+        if line.startswith(NEGATIVE_PREFIX):
+            target = negative
+            line = line[len(NEGATIVE_PREFIX):]
+        target.append(line.strip())
+
+    info['positive'] = '\n'.join(positive).strip()
+    info['negative'] = '\n'.join(negative).strip()
+    info['steps'] = settings.get('Steps')
+    info['seed'] = settings.get('Seed')
+    info['model'] = settings.get('Model') or settings.get('Model hash')
+    info['cfg_scale'] = settings.get('CFG scale')
+    info['sampler'] = settings.get('Sampler')
+    return info
+
+
+def parse_comfyui_prompt(prompt_json):
+    """
+    Pull prompt text and sampler settings from a ComfyUI API 'prompt' graph.
+
+    Only text reachable from a sampler's positive/negative inputs is used;
+    when no sampler is found, all text-encode nodes count as positive.
+    """
+    if 'class_type' not in prompt_json:
+        return None
+    try:
+        graph = json.loads(prompt_json)
+    except ValueError:
+        return None
+    if not isinstance(graph, dict):
+        return None
+
+    info = _empty_info('comfyui')
+    samplers = [
+        node for node in graph.values()
+        if isinstance(node, dict) and 'Sampler' in str(node.get('class_type', ''))
+        and isinstance(node.get('inputs'), dict)
+    ]
+
+    if samplers:
+        inputs = samplers[0]['inputs']
+        info['positive'] = _comfy_text(graph, inputs.get('positive'))
+        info['negative'] = _comfy_text(graph, inputs.get('negative'))
+        info['steps'] = _scalar(inputs.get('steps'))
+        info['seed'] = _scalar(inputs.get('seed', inputs.get('noise_seed')))
+        info['cfg_scale'] = _scalar(inputs.get('cfg'))
+        info['sampler'] = _scalar(inputs.get('sampler_name'))
+    else:
+        info['positive'] = '\n'.join(
+            text for node in graph.values()
+            if isinstance(node, dict) and 'TextEncode' in str(node.get('class_type', ''))
+            for text in [_node_text(graph, node, 0)] if text
+        )
+
+    for node in graph.values():
+        if isinstance(node, dict) and isinstance(node.get('inputs'), dict) and 'ckpt_name' in node['inputs']:
+            info['model'] = _scalar(node['inputs']['ckpt_name'])
+            break
+
+    return info
+
+
+def parse_comfyui_workflow(workflow_json):
+    """
+    Fallback for images that only carry the UI 'workflow' graph.
+    Text-encode widget values are collected as the positive prompt.
+    """
+    if 'CLIPTextEncode' not in workflow_json:
+        return None
+    try:
+        workflow = json.loads(workflow_json)
+    except ValueError:
+        return None
+
+    info = _empty_info('comfyui')
+    texts = []
+    for node in workflow.get('nodes', []) if isinstance(workflow, dict) else []:
+        if 'CLIPTextEncode' in str(node.get('type', '')):
+            values = node.get('widgets_values') or []
+            if values and isinstance(values[0], str):
+                texts.append(values[0])
+    info['positive'] = '\n'.join(texts)
+    return info
+
+
+def _comfy_text(graph, link, depth=0):
+    """Follow a [node_id, slot] link back to the text that feeds it"""
+    if not isinstance(link, list) or not link or depth > 8:
+        return ''
+    node = graph.get(str(link[0]))
+    if not isinstance(node, dict):
+        return ''
+    return _node_text(graph, node, depth)
+
+
+def _node_text(graph, node, depth):
+    """Text held by a node, following links through conditioning nodes"""
+    inputs = node.get('inputs')
+    if not isinstance(inputs, dict):
+        return ''
+
+    parts = []
+    for name in COMFY_TEXT_INPUTS:
+        value = inputs.get(name)
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            parts.append(_comfy_text(graph, value, depth + 1))
+    if parts:
+        return '\n'.join(part for part in parts if part)
+
+    # Conditioning combine/concat nodes: follow their conditioning inputs
+    for name, value in inputs.items():
+        if name.startswith('conditioning') and isinstance(value, list):
+            parts.append(_comfy_text(graph, value, depth + 1))
+    return '\n'.join(part for part in parts if part)
+
+
+def _scalar(value):
+    """Links ([node_id, slot]) are not literal values"""
+    return None if isinstance(value, list) else value
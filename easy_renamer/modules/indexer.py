@@ -0,0 +1,214 @@
+import io
+import multiprocessing
+import os
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.generation_info import parse_generation_info
+from modules.keyword_matcher import match_keywords
+from modules.metadata_cache import get_metadata_cache, settings_version
+from modules.metadata_reader import read_text_metadata
+
+# One row of the batch metadata index
+IndexRecord = namedtuple('IndexRecord', ['name', 'size', 'digest', 'extracted', 'mapped', 'error'])
+
+
+def extract_keywords(file, metadata_keywords, keyword_mappings, cache=None):
+    """
+    Extract and map metadata keywords for one file object.
+    Returns (digest, result) where result has 'extracted' and 'mapped' lists
+    and 'generation' (structured generation parameters or None).
+    """
+    cache = cache or get_metadata_cache()
+    digest = cache.digest(file)
+    version = settings_version(metadata_keywords, keyword_mappings)
+    result = cache.get(digest, version)
+    if result is not None:
+        return digest, result
+
+    # Read only the text chunks/segments, never the pixel data
+    texts = read_text_metadata(file) or {}
+
+    # Prefer the positive prompt when the generator's format is known
+    generation = parse_generation_info(texts)
+    if generation and generation['positive']:
+        sources = [generation['positive']]
+    else:
+        sources = texts.values()
+
+    # Match all keywords (and mapping keys) in one pass per text block
+    result = match_keywords(sources, metadata_keywords, keyword_mappings)
+    result['generation'] = generation
+    cache.put(digest, version, result)
+    return digest, result
+
+
+# Settings handed to each worker process once, not with every task
+_worker_settings = None
+
+
+def _init_worker(metadata_keywords, keyword_mappings):
+    global _worker_settings
+    _worker_settings = (metadata_keywords, keyword_mappings)
+
+
+def _index_one(name, source):
+    """
+    Worker entry point. source is a file path or the file's bytes.
+    """
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                size = os.fstat(file.fileno()).st_size
+                digest, result = extract_keywords(file, *_worker_settings)
+        else:
+            size = len(source)
+            digest, result = extract_keywords(io.BytesIO(source), *_worker_settings)
+        return IndexRecord(name, size, digest, tuple(result['extracted']), tuple(result['mapped']), None)
+    except Exception as e:
+        return IndexRecord(name, 0, None, (), (), str(e))
+
+
+def _index_source(file):
+    """What to send to a worker: a path for files on disk, otherwise the bytes"""
+    if isinstance(file, str):
+        return file
+    if hasattr(file, 'getvalue'):
+        # getvalue() ignores the read position, so the UI can keep using the file
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+class IndexJob:
+    """
+    Extract metadata keywords for a whole upload set on a process pool.
+
+    The job runs on a background thread so the Streamlit script is never
+    blocked; the UI polls done/total and reads finished rows from records.
+    Only max_workers * 2 files are sent to workers at a time. A file that
+    cannot be indexed gets a row with its error; if the pool itself breaks
+    (e.g. a worker is killed), the remaining files are recorded as failed
+    and error is set, so the job always ends.
+    """
+
+    def __init__(self, files, metadata_keywords, keyword_mappings, max_workers=None, ids=None):
+        self.files = list(files)
+        # Caller's id for each file (e.g. catalog ids), in the same order as files
+        self.ids = list(ids) if ids is not None else list(range(len(self.files)))
+        self.names = [os.path.basename(file) if isinstance(file, str) else file.name for file in self.files]
+        self.metadata_keywords = list(metadata_keywords)
+        self.keyword_mappings = {key: list(values) for key, values in keyword_mappings.items()}
+        self.version = settings_version(self.metadata_keywords, self.keyword_mappings)
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        self.total = len(self.files)
+        self.done = 0
+        self.errors = 0
+        self.records = [None] * self.total
+        # Set when the job stopped early because the pool failed
+        self.error = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def join(self, timeout=None):
+        """Wait for the job to finish (for scripts; the UI polls instead)"""
+        self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def finished(self):
+        return not self.running and self.done == self.total
+
+    def _failed(self, index, message):
+        return IndexRecord(self.names[index], 0, None, (), (), message)
+
+    def _submit(self, executor, index):
+        """Send one file to the pool; a file that cannot be read fails on its own"""
+        try:
+            source = _index_source(self.files[index])
+        except Exception as e:
+            future = Future()
+            future.set_result(self._failed(index, str(e)))
+            return future
+        return executor.submit(_index_one, self.names[index], source)
+
+    def _finish(self, index, record):
+        self.records[index] = record
+        if record.error is not None:
+            self.errors += 1
+        self.done += 1
+
+    def _run(self):
+        try:
+            self._run_pool()
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            # Rows are finished in order, so everything from done on is left
+            for index in range(self.done, self.total):
+                self._finish(index, self._failed(index, self.error))
+
+    def _run_pool(self):
+        # spawn: forking a multi-threaded Streamlit server is not safe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.metadata_keywords, self.keyword_mappings)
+        ) as executor:
+            pending = deque()
+            next_index = 0
+            window = self.max_workers * 2
+
+            while next_index < self.total or pending:
+                while (next_index < self.total and len(pending) < window
+                       and not self._cancelled.is_set()):
+                    pending.append((next_index, self._submit(executor, next_index)))
+                    next_index += 1
+
+                if not pending:
+                    break
+
+                index, future = pending.popleft()
+                try:
+                    record = future.result()
+                except BrokenProcessPool:
+                    # Every other task on the pool fails the same way
+                    raise
+                except Exception as e:
+                    record = self._failed(index, str(e))
+                self._finish(index, record)
+
+    def keywords_by_id(self):
+        """{id: (extracted, mapped)} for the rows finished without error"""
+        return {
+            self.ids[index]: (record.extracted, record.mapped)
+            for index, record in enumerate(self.records)
+            if record is not None and record.error is None
+        }
+
+    def table(self):
+        """Finished rows as plain dicts, e.g. for st.dataframe"""
+        return [
+            {
+                'ファイル名': record.name,
+                'サイズ': record.size,
+                'ハッシュ': record.digest,
+                '抽出キーワード': ', '.join(record.extracted),
+                'マッピング': ', '.join(record.mapped),
+            }
+            for record in self.records if record is not None
+        ]
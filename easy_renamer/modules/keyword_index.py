@@ -0,0 +1,110 @@
+import bisect
+import heapq
+from array import array
+
+# Facet filter modes: every selected keyword, or any of them
+MATCH_ALL = 'and'
+MATCH_ANY = 'or'
+
+
+class KeywordIndex:
+    """
+    Inverted index from metadata keywords to catalog ids.
+
+    Each keyword maps to a sorted array('I') of the ids of the images whose
+    extracted or mapped keywords contain it. An AND filter intersects the
+    selected arrays starting from the shortest one, an OR filter merges
+    them, and the result is again a sorted id array, cached until the index
+    changes so the image list can page through the same object on every
+    rerun.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._synced = 0
+        self._filter_cache = {}
+
+    def __len__(self):
+        """Number of distinct keywords"""
+        return len(self._postings)
+
+    def add(self, record_id, keywords):
+        """Index one image; repeated keywords are counted once"""
+        for keyword in set(keywords):
+            posting = self._postings.get(keyword)
+            if posting is None:
+                posting = self._postings[keyword] = array('I')
+            if not posting or posting[-1] < record_id:
+                posting.append(record_id)
+            else:
+                position = bisect.bisect_left(posting, record_id)
+                if position == len(posting) or posting[position] != record_id:
+                    posting.insert(position, record_id)
+        self._filter_cache = {}
+
+    def sync(self, job, catalog=None):
+        """
+        Add the rows an IndexJob finished since the last call. Rows are
+        completed in order, so only the new ones are read. With catalog
+        (the UploadCatalog the job's ids come from), each indexed record
+        also gets its content digest.
+        """
+        done = job.done
+        if done == self._synced:
+            return 0
+        for position in range(self._synced, done):
+            record = job.records[position]
+            if record is not None and record.error is None:
+                record_id = job.ids[position]
+                self.add(record_id, record.extracted + record.mapped)
+                if catalog is not None:
+                    entry = catalog.get(record_id)
+                    if entry is not None:
+                        entry.digest = record.digest
+        added = done - self._synced
+        self._synced = done
+        return added
+
+    def count(self, keyword):
+        posting = self._postings.get(keyword)
+        return len(posting) if posting is not None else 0
+
+    def facets(self):
+        """(keyword, image count) pairs, most common first"""
+        return sorted(
+            ((keyword, len(posting)) for keyword, posting in self._postings.items()),
+            key=lambda item: (-item[1], item[0])
+        )
+
+    def filter(self, keywords, mode=MATCH_ALL):
+        """
+        Ids of the images matching the selected keywords, as a sorted array('I')
+        """
+        key = (tuple(sorted(set(keywords))), mode)
+        cached = self._filter_cache.get(key)
+        if cached is not None:
+            return cached
+
+        postings = [self._postings.get(keyword, array('I')) for keyword in key[0]]
+        if not postings:
+            result = array('I')
+        elif mode == MATCH_ALL:
+            # Start from the shortest list so the working set only shrinks
+            postings.sort(key=len)
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                if not matches:
+                    break
+                matches.intersection_update(posting)
+            result = array('I', sorted(matches))
+        else:
+            merged = heapq.merge(*postings)
+            result = array('I')
+            last = None
+            for record_id in merged:
+                if record_id != last:
+                    result.append(record_id)
+                    last = record_id
+
+        self._filter_cache[key] = result
+        return result
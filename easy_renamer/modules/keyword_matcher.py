@@ -0,0 +1,118 @@
+from collections import deque
+from functools import lru_cache
+
+
+def _is_word_char(char):
+    """Same notion of a word character as the regex \\w class"""
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a keyword vocabulary.
+
+    All keywords, including multi-word ones such as "best quality", are
+    found in a single linear pass over the text. Matches must sit on word
+    boundaries, so "8k" does not match inside "18k".
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for index, keyword in enumerate(self.keywords):
+            self._insert(keyword, index)
+        self._build_failure_links()
+
+    def _insert(self, keyword, index):
+        """Add one keyword to the trie"""
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node] = self._output[node] + (index,)
+
+    def _build_failure_links(self):
+        """Breadth-first construction of failure links and merged outputs"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        """
+        Return the set of keywords that occur in text on word boundaries
+        """
+        found = set()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        keywords = self.keywords
+        node = 0
+
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            for index in output[node]:
+                keyword = keywords[index]
+                start = position - len(keyword) + 1
+                if _is_word_char(keyword[0]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                end = position + 1
+                if _is_word_char(keyword[-1]) and end < len(text) and _is_word_char(text[end]):
+                    continue
+                found.add(keyword)
+
+        return found
+
+    def find_all(self, texts):
+        """Return the set of keywords found in any of the texts"""
+        found = set()
+        for text in texts:
+            found |= self.find(text)
+        return found
+
+
+@lru_cache(maxsize=8)
+def get_keyword_matcher(keywords):
+    """
+    Return a compiled matcher for a tuple of keywords.
+    The automaton is only rebuilt when the vocabulary changes.
+    """
+    return KeywordMatcher(keywords)
+
+
+def match_keywords(texts, metadata_keywords, keyword_mappings):
+    """
+    Find metadata keywords (and mapping keys) in texts.
+    Returns a dictionary with sorted extracted and mapped keywords.
+    """
+    vocabulary = tuple(metadata_keywords) + tuple(keyword_mappings)
+    found = get_keyword_matcher(vocabulary).find_all(texts)
+
+    mapped = set()
+    for keyword in found:
+        mapped.update(keyword_mappings.get(keyword, ()))
+
+    return {
+        'extracted': sorted(found),
+        'mapped': sorted(mapped)
+    }
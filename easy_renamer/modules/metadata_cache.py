@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+# Bump when the extraction logic changes so stale results are not reused
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'EASY_RENAMER_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'easy_renamer')
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Check the total cache size after this many inserts
+EVICTION_INTERVAL = 64
+
+# Number of results also kept in process memory
+MEMORY_ENTRIES = 2048
+
+
+def content_hash(file):
+    """
+    Stream a file object through BLAKE2b and return the hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    file.seek(0)
+    while True:
+        chunk = file.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def settings_version(metadata_keywords, keyword_mappings):
+    """
+    Short hash of the settings that affect extracted/mapped keywords
+    """
+    return _settings_version(
+        tuple(metadata_keywords),
+        tuple((key, tuple(values)) for key, values in keyword_mappings.items())
+    )
+
+
+@lru_cache(maxsize=16)
+def _settings_version(metadata_keywords, keyword_mappings):
+    payload = json.dumps([CACHE_FORMAT_VERSION, metadata_keywords, keyword_mappings], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _file_identity(file):
+    """
+    Cheap key that identifies unchanged file content within this process,
+    so the content hash is not recomputed on every Streamlit rerun
+    """
+    file_id = getattr(file, 'file_id', None)
+    if file_id is not None:
+        return ('upload', file_id)
+    name = getattr(file, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        stat = os.stat(name)
+        return ('path', os.path.abspath(name), stat.st_size, stat.st_mtime_ns)
+    return None
+
+
+class MetadataCache:
+    """
+    Content-addressed cache of metadata extraction results.
+
+    Results live in a SQLite database in WAL mode, so every session and
+    worker process on the host shares them. Entries are keyed by content
+    hash plus settings version and evicted least-recently-used once the
+    stored size exceeds max_bytes. Recent hits are also kept in memory.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, 'metadata.sqlite3')
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._digests = OrderedDict()
+        self._inserts = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metadata ('
+                ' digest TEXT NOT NULL,'
+                ' version TEXT NOT NULL,'
+                ' result TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' last_used REAL NOT NULL,'
+                ' PRIMARY KEY (digest, version))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS metadata_last_used ON metadata (last_used)')
+
+    def _connection(self):
+        """One connection per thread; SQLite connections are not shared"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def digest(self, file):
+        """
+        Content hash of a file, memoized per upload or path/mtime
+        """
+        identity = _file_identity(file)
+        if identity is not None:
+            with self._lock:
+                digest = self._digests.get(identity)
+                if digest is not None:
+                    self._digests.move_to_end(identity)
+                    return digest
+
+        digest = content_hash(file)
+        if identity is not None:
+            with self._lock:
+                self._digests[identity] = digest
+                if len(self._digests) > MEMORY_ENTRIES:
+                    self._digests.popitem(last=False)
+        return digest
+
+    def get(self, digest, version):
+        """Return the cached result or None"""
+        key = (digest, version)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                return result
+
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT result FROM metadata WHERE digest = ? AND version = ?', key
+        ).fetchone()
+        if row is None:
+            return None
+
+        with conn:
+            conn.execute(
+                'UPDATE metadata SET last_used = ? WHERE digest = ? AND version = ?',
+                (time.time(), digest, version)
+            )
+        result = json.loads(row[0])
+        self._remember(key, result)
+        return result
+
+    def put(self, digest, version, result):
+        """Store a result and evict old entries when over budget"""
+        payload = json.dumps(result, ensure_ascii=False)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO metadata (digest, version, result, size, last_used)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (digest, version, payload, len(payload.encode('utf-8')), time.time())
+            )
+        self._remember((digest, version), result)
+
+        with self._lock:
+            self._inserts += 1
+            check = self._inserts % EVICTION_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Delete least-recently-used rows until the cache fits max_bytes"""
+        conn = self._connection()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM metadata').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        target = total - int(self.max_bytes * 0.9)
+        with conn:
+            rows = conn.execute(
+                'SELECT digest, version, size FROM metadata ORDER BY last_used'
+            )
+            doomed = []
+            for digest, version, size in rows:
+                doomed.append((digest, version))
+                target -= size
+                if target <= 0:
+                    break
+            conn.executemany('DELETE FROM metadata WHERE digest = ? AND version = ?', doomed)
+            removed = len(doomed)
+
+        with self._lock:
+            for key in doomed:
+                self._memory.pop(key, None)
+        return removed
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            if len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_metadata_cache():
+    """Process-wide cache instance shared by all Streamlit sessions"""
+    return MetadataCache()
@@ -0,0 +1,249 @@
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Text chunks larger than this are skipped instead of read into memory
+MAX_TEXT_CHUNK = 64 * 1024 * 1024
+
+EXIF_HEADER = b'Exif\x00\x00'
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+
+# EXIF tags that can carry prompts or descriptions
+TAG_IMAGE_DESCRIPTION = 0x010E
+TAG_EXIF_IFD = 0x8769
+TAG_USER_COMMENT = 0x9286
+TAG_XP_COMMENT = 0x9C9C
+
+# TIFF field type -> size in bytes
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+USER_COMMENT_PREFIXES = {
+    b'ASCII\x00\x00\x00': 'ascii',
+    b'JIS\x00\x00\x00\x00\x00': 'shift_jis',
+}
+USER_COMMENT_UNICODE = b'UNICODE\x00'
+
+
+def read_text_metadata(file):
+    """
+    Return a dict of metadata key -> text for a PNG, JPEG or WebP file.
+
+    Only text-bearing chunks/segments are read; everything else is skipped
+    with seek() and reading stops before the first pixel data (PNG IDAT,
+    JPEG SOS). WebP keeps EXIF/XMP after the bitstream, so the bitstream
+    chunks are seeked over rather than read.
+
+    PNG text chunks keep their own keys (e.g. 'parameters', 'prompt').
+    EXIF fields are returned as 'UserComment', 'ImageDescription' and
+    'XPComment', XMP packets as 'XMP' and JPEG COM segments as 'comment'.
+    Returns None when the format is not recognised.
+    """
+    file.seek(0)
+    head = file.read(12)
+    file.seek(0)
+
+    if head.startswith(PNG_SIGNATURE):
+        return _read_png(file)
+    if head.startswith(b'\xff\xd8'):
+        return _read_jpeg(file)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return _read_webp(file)
+    return None
+
+
+def _read_png(file):
+    """Collect tEXt/zTXt/iTXt chunks until the first IDAT"""
+    texts = {}
+    file.seek(len(PNG_SIGNATURE))
+
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+
+        if chunk_type in (b'tEXt', b'zTXt', b'iTXt') and length <= MAX_TEXT_CHUNK:
+            data = file.read(length)
+            file.seek(4, 1)  # CRC
+            try:
+                key, text = _decode_png_text(chunk_type, data)
+            except (ValueError, zlib.error):
+                continue
+            _add_text(texts, key, text)
+        else:
+            file.seek(length + 4, 1)
+
+    return texts
+
+
+def _decode_png_text(chunk_type, data):
+    """Decode one PNG text chunk into (key, text)"""
+    key, _, rest = data.partition(b'\x00')
+    key = key.decode('latin-1')
+
+    if chunk_type == b'tEXt':
+        return key, rest.decode('latin-1')
+
+    if chunk_type == b'zTXt':
+        # rest[0] is the compression method (always zlib)
+        return key, zlib.decompress(rest[1:]).decode('latin-1')
+
+    # iTXt: flag, method, language\0, translated keyword\0, text
+    compressed = rest[0]
+    _, _, rest = rest[2:].partition(b'\x00')
+    _, _, text = rest.partition(b'\x00')
+    if compressed:
+        text = zlib.decompress(text)
+    return key, text.decode('utf-8', errors='replace')
+
+
+def _read_jpeg(file):
+    """Collect APP1 (EXIF/XMP) and COM segments until start of scan"""
+    texts = {}
+    file.seek(2)
+
+    while True:
+        byte = file.read(1)
+        if not byte:
+            break
+        if byte != b'\xff':
+            continue
+        marker = file.read(1)
+        # Skip fill bytes
+        while marker == b'\xff':
+            marker = file.read(1)
+        if not marker:
+            break
+        marker = marker[0]
+
+        # SOS or EOI: pixel data (or nothing) follows
+        if marker in (0xDA, 0xD9):
+            break
+        # Standalone markers carry no length
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+
+        raw_length = file.read(2)
+        if len(raw_length) < 2:
+            break
+        length = struct.unpack('>H', raw_length)[0] - 2
+
+        if marker == 0xE1:
+            data = file.read(length)
+            if data.startswith(EXIF_HEADER):
+                for key, text in _parse_exif(data[len(EXIF_HEADER):]).items():
+                    _add_text(texts, key, text)
+            elif data.startswith(XMP_HEADER):
+                _add_text(texts, 'XMP', data[len(XMP_HEADER):].decode('utf-8', errors='ignore'))
+        elif marker == 0xFE:
+            _add_text(texts, 'comment', file.read(length).decode('utf-8', errors='replace'))
+        else:
+            file.seek(length, 1)
+
+    return texts
+
+
+def _read_webp(file):
+    """Collect EXIF and XMP chunks, seeking over the image bitstream"""
+    texts = {}
+    riff_size = struct.unpack('<I', file.read(8)[4:8])[0]
+    end = riff_size + 8
+    file.seek(12)
+
+    while file.tell() + 8 <= end:
+        header = file.read(8)
+        if len(header) < 8:
+            break
+        fourcc, size = struct.unpack('<4sI', header)
+        padded = size + (size & 1)
+
+        if fourcc == b'EXIF' and size <= MAX_TEXT_CHUNK:
+            data = file.read(size)
+            if data.startswith(EXIF_HEADER):
+                data = data[len(EXIF_HEADER):]
+            for key, text in _parse_exif(data).items():
+                _add_text(texts, key, text)
+            file.seek(padded - size, 1)
+        elif fourcc == b'XMP ' and size <= MAX_TEXT_CHUNK:
+            _add_text(texts, 'XMP', file.read(size).decode('utf-8', errors='ignore'))
+            file.seek(padded - size, 1)
+        else:
+            file.seek(padded, 1)
+
+    return texts
+
+
+def _parse_exif(tiff):
+    """
+    Extract text tags from a TIFF-structured EXIF block
+    """
+    texts = {}
+    if len(tiff) < 8 or tiff[:2] not in (b'II', b'MM'):
+        return texts
+    order = '<' if tiff[:2] == b'II' else '>'
+
+    try:
+        ifd0 = _read_ifd(tiff, order, struct.unpack(order + 'I', tiff[4:8])[0])
+
+        if TAG_IMAGE_DESCRIPTION in ifd0:
+            texts['ImageDescription'] = ifd0[TAG_IMAGE_DESCRIPTION].rstrip(b'\x00').decode('utf-8', errors='replace')
+        if TAG_XP_COMMENT in ifd0:
+            texts['XPComment'] = ifd0[TAG_XP_COMMENT].decode('utf-16-le', errors='replace').rstrip('\x00')
+
+        if TAG_EXIF_IFD in ifd0:
+            exif_offset = struct.unpack(order + 'I', ifd0[TAG_EXIF_IFD][:4])[0]
+            exif_ifd = _read_ifd(tiff, order, exif_offset)
+            if TAG_USER_COMMENT in exif_ifd:
+                comment = _decode_user_comment(exif_ifd[TAG_USER_COMMENT])
+                if comment:
+                    texts['UserComment'] = comment
+    except (struct.error, IndexError):
+        pass
+
+    return texts
+
+
+def _read_ifd(tiff, order, offset):
+    """Return {tag: raw value bytes} for one IFD"""
+    entries = {}
+    count = struct.unpack(order + 'H', tiff[offset:offset + 2])[0]
+
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, field_type, value_count = struct.unpack(order + 'HHI', tiff[entry:entry + 8])
+        size = TIFF_TYPE_SIZES.get(field_type, 1) * value_count
+        if size <= 4:
+            entries[tag] = tiff[entry + 8:entry + 8 + size]
+        else:
+            value_offset = struct.unpack(order + 'I', tiff[entry + 8:entry + 12])[0]
+            entries[tag] = tiff[value_offset:value_offset + size]
+
+    return entries
+
+
+def _decode_user_comment(value):
+    """Decode an EXIF UserComment, including its 8-byte charset prefix"""
+    prefix, body = value[:8], value[8:]
+
+    if prefix == USER_COMMENT_UNICODE:
+        if body[:2] in (b'\xff\xfe', b'\xfe\xff'):
+            return body.decode('utf-16', errors='replace').rstrip('\x00')
+        # piexif (used by A1111) writes big-endian; guess from where the zero bytes sit
+        even_zeros = body[0::2].count(0)
+        odd_zeros = body[1::2].count(0)
+        encoding = 'utf-16-be' if even_zeros >= odd_zeros else 'utf-16-le'
+        return body.decode(encoding, errors='replace').rstrip('\x00')
+
+    encoding = USER_COMMENT_PREFIXES.get(prefix, 'utf-8')
+    return body.decode(encoding, errors='replace').rstrip('\x00')
+
+
+def _add_text(texts, key, text):
+    """Store text under key, appending if the key appears more than once"""
+    if key in texts:
+        texts[key] += '\n' + text
+    else:
+        texts[key] = text
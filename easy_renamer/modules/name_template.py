@@ -0,0 +1,265 @@
+import string
+import unicodedata
+from datetime import datetime
+
+
+class TemplateError(ValueError):
+    """Raised when a filename template cannot be compiled"""
+    pass
+
+
+def _format_counter(context, spec):
+    return format(context['n'], spec)
+
+
+# Stands in for the rendered counter while the text around it is shortened
+_COUNTER_MARK = '\x00'
+
+# Path separators (both kinds, so a name is safe on any OS) and control
+# characters are replaced in every rendered name
+_UNSAFE_CHARS = str.maketrans(dict.fromkeys(['/', '\\', '\x7f'] + [chr(i) for i in range(32)], '_'))
+
+
+def safe_filename(name):
+    """
+    Make a rendered name a single path component: separators, control
+    characters and leading dots (so '..' cannot climb out) become '_'
+    """
+    name = name.translate(_UNSAFE_CHARS)
+    stripped = name.lstrip('.')
+    if len(stripped) != len(name):
+        name = '_' * (len(name) - len(stripped)) + stripped
+    return name
+
+
+def _word_list_formatter(key):
+    """
+    Formatter for a list of words: {key} joins all of them,
+    {key:3} only the first three
+    """
+    def format_words(context, spec):
+        words = context.get(key) or []
+        if spec:
+            words = words[:int(spec)]
+        return ' '.join(words)
+    return format_words
+
+
+def _word_list_validator(key):
+    def validate(spec):
+        if spec and not spec.isdigit():
+            raise TemplateError(f"{{{key}:{spec}}} の指定は数字である必要があります")
+    return validate
+
+
+def _format_date(context, spec):
+    return context.get('date', datetime.now()).strftime(spec or '%Y%m%d')
+
+
+def _format_stem(context, spec):
+    return format(context.get('stem', ''), spec)
+
+
+def _format_text(context, spec):
+    return format(context.get('text', ''), spec)
+
+
+# Placeholder name -> (formatter, spec validator)
+FIELDS = {
+    'n': (_format_counter, None),
+    'date': (_format_date, None),
+    'stem': (_format_stem, None),
+    'text': (_format_text, None),
+}
+
+# Per-image word lists (see RenamerCore.plan_batch_names)
+WORD_LIST_FIELDS = ('keywords', 'mapped', 'extracted', 'big', 'small')
+FIELDS.update(
+    (key, (_word_list_formatter(key), _word_list_validator(key))) for key in WORD_LIST_FIELDS
+)
+
+# Context used to check format specs at compile time
+SAMPLE_CONTEXT = {
+    'n': 1,
+    'keywords': ['keyword'],
+    'mapped': ['keyword'],
+    'extracted': ['keyword'],
+    'big': ['big'],
+    'small': ['small'],
+    'date': datetime(2000, 1, 1),
+    'stem': 'image',
+    'text': 'text',
+}
+
+
+def escape(text):
+    """Escape literal text so braces are not read as placeholders"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+class NameTemplate:
+    """
+    Filename template compiled once and rendered for a whole batch.
+
+    Placeholders: {n} (counter, e.g. {n:03d}), {keywords} / {keywords:3},
+    {date} / {date:%Y-%m-%d}, {stem} (original name without extension)
+    and {text} (the rename input). The batch naming mode adds per-image
+    word lists: {mapped}, {extracted}, {big} and {small}, each with an
+    optional count like {mapped:3}.
+    """
+
+    def __init__(self, pattern, fields=None):
+        self.pattern = pattern
+        self.field_table = fields or FIELDS
+        self.fields = set()
+        self._parts = self._compile(pattern)
+
+    def _compile(self, pattern):
+        """Parse the pattern into literal strings and (formatter, spec) pairs"""
+        try:
+            parsed = list(string.Formatter().parse(pattern))
+        except ValueError as e:
+            raise TemplateError(f"形式が不正です: {e}")
+
+        parts = []
+        for literal, field, spec, conversion in parsed:
+            if literal:
+                parts.append(literal)
+            if field is None:
+                continue
+            if conversion:
+                raise TemplateError(f"変換指定 !{conversion} は使用できません")
+            if field not in self.field_table:
+                raise TemplateError(f"不明なプレースホルダー {{{field}}} です")
+            if spec and '{' in spec:
+                raise TemplateError("入れ子のプレースホルダーは使用できません")
+
+            formatter, validator = self.field_table[field]
+            if validator is not None:
+                validator(spec)
+            self.fields.add(field)
+            parts.append((formatter, spec))
+
+        # Render once with sample values so bad format specs fail here, not per file
+        try:
+            self._render(parts, SAMPLE_CONTEXT)
+        except (ValueError, TypeError, KeyError) as e:
+            raise TemplateError(f"形式が不正です: {e}")
+        return parts
+
+    @staticmethod
+    def _render(parts, context):
+        return ''.join(
+            part if isinstance(part, str) else part[0](context, part[1])
+            for part in parts
+        )
+
+    @classmethod
+    def from_numbering(cls, custom_numbering, text, position='suffix'):
+        """
+        Build the template used by the rename tab: the numbering format
+        placed before or after the literal rename text
+        """
+        if position == 'prefix':
+            return cls(f"{custom_numbering} {escape(text)}")
+        return cls(f"{escape(text)} {custom_numbering}")
+
+    def render(self, context):
+        """Render one name"""
+        return safe_filename(self._render(self._parts, context))
+
+    def render_batch(self, contexts, extensions=None, max_bytes=None, collapse_spaces=False):
+        """
+        Render names for a whole batch in one pass.
+
+        When extensions and max_bytes are given, each stem is truncated so
+        stem + extension fits max_bytes in UTF-8; the text is cut, not the
+        {n} counter, so long names stay distinct. Separators and control
+        characters in the rendered values (text, keywords, the original
+        stem) are replaced, see safe_filename. collapse_spaces squeezes
+        the runs of spaces left by empty placeholders. Returns (names, errors)
+        where errors lists (index, message) for contexts that failed.
+        """
+        names = []
+        errors = []
+        render = self._render
+        parts = self._parts
+
+        for index, context in enumerate(contexts):
+            try:
+                stem = safe_filename(render(parts, context))
+            except (ValueError, TypeError, KeyError) as e:
+                errors.append((index, str(e)))
+                stem = str(context.get('n', index + 1))
+                context = None
+            if collapse_spaces:
+                stem = ' '.join(filter(None, stem.split(' ')))
+            ext = extensions[index] if extensions is not None else ''
+            if max_bytes is not None:
+                limit = max_bytes - len(ext.encode('utf-8'))
+                if len(stem.encode('utf-8')) > limit:
+                    if context is not None:
+                        stem = self._render_fitted(context, limit, collapse_spaces)
+                    else:
+                        stem = truncate_utf8(stem, limit)
+            names.append(stem + ext)
+
+        return names, errors
+
+    def _render_fitted(self, context, max_bytes, collapse_spaces=False):
+        """
+        Render a name that is too long, shortening the text around the
+        {n} counters so the counter survives and names stay distinct
+        """
+        counters = []
+        pieces = []
+        for part in self._parts:
+            if isinstance(part, str):
+                pieces.append(part.translate(_UNSAFE_CHARS))
+            elif part[0] is _format_counter:
+                counters.append(part[0](context, part[1]))
+                pieces.append(_COUNTER_MARK)
+            else:
+                pieces.append(part[0](context, part[1]).translate(_UNSAFE_CHARS))
+        text = ''.join(pieces)
+        if collapse_spaces:
+            text = ' '.join(filter(None, text.split(' ')))
+
+        segments = text.split(_COUNTER_MARK)
+        sizes = [len(segment.encode('utf-8')) for segment in segments]
+        excess = sum(sizes) + sum(len(counter.encode('utf-8')) for counter in counters) - max_bytes
+
+        # Shorten the longest segments first, keeping the spaces that separate them from the counter
+        for i in sorted(range(len(segments)), key=lambda i: -sizes[i]):
+            if excess <= 0:
+                break
+            segment = segments[i]
+            core = segment.strip(' ')
+            lead = segment[:len(segment) - len(segment.lstrip(' '))]
+            trail = segment[len(segment.rstrip(' ')):]
+            core_bytes = len(core.encode('utf-8'))
+            shortened = truncate_utf8(core, core_bytes - excess)
+            excess -= core_bytes - len(shortened.encode('utf-8'))
+            segments[i] = lead + shortened + trail if shortened else lead or trail
+
+        stem = segments[0]
+        for counter, segment in zip(counters, segments[1:]):
+            stem += counter + segment
+        # Only the counters themselves are left to cut
+        return truncate_utf8(safe_filename(stem), max_bytes)
+
+
+def truncate_utf8(text, max_bytes):
+    """
+    Truncate text to at most max_bytes of UTF-8 without splitting a
+    character (or separating a base character from its combining marks)
+    """
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+
+    truncated = encoded[:max(max_bytes, 0)].decode('utf-8', errors='ignore')
+    # Drop a base character whose combining marks (e.g. dakuten) were cut off
+    while truncated and len(truncated) < len(text) and unicodedata.combining(text[len(truncated)]):
+        truncated = truncated[:-1]
+    return truncated.rstrip()
@@ -1,208 +1,183 @@
 import os
-import json
-import io
-import zipfile
-import shutil
-import time
+from functools import lru_cache
 import streamlit as st
-from PIL import Image
-from PIL.ExifTags import TAGS
-import piexif
-from datetime import datetime
-import re
+from modules.core import SETTINGS_PATH, RenamerCore, default_settings, ensure_settings_keys, load_app_config
+from modules.settings_store import get_settings_store
+from modules.word_index import WordIndex
+
+# Output directory used by the upload tab
+OUTPUT_DIR = 'renamed_images'
+
+# Settings categories offered as word blocks and in the word search
+WORD_CATEGORIES = ('template_texts', 'big_words', 'small_words')
+
+@lru_cache(maxsize=None)
+def _shared_word_index():
+    """Process-wide word index, like the settings store it mirrors"""
+    return WordIndex()
 
 class EasyRenamer:
+    """
+    Streamlit wrapper around RenamerCore: settings live in st.session_state
+    and problems are shown with st.error. See modules/cli.py for the
+    headless entry point.
+    """
+
     def __init__(self):
+        # One store per process; every session edits the same settings dict
+        self.store = get_settings_store(SETTINGS_PATH, default_settings)
+        self.store.reload_if_changed()
+
         # Initialize settings in session state if not present
-        if 'settings' not in st.session_state:
-            # Default settings
-            st.session_state.settings = {
-                'template_texts': ["新品 正規品", "送料無料", "即決", "即購入OK"],
-                'big_words': ["アート", "イラスト", "原画", "絵画", "AI絵画"],
-                'small_words': ["風景", "美女", "美人", "廃墟", "SF", "ファンタジー"],
-                'metadata_keywords': ["masterpiece", "best quality", "ultra detailed", "8k", "highres"],
-                'keyword_mappings': {
-                    "masterpiece": ["傑作", "名作"],
-                    "best quality": ["最高品質"],
-                    "ultra detailed": ["超高詳細"],
-                    "8k": ["高解像度"],
-                    "highres": ["高解像度"],
-                }
-            }
-            
+        if st.session_state.get('settings') is not self.store.settings:
+            st.session_state.settings = self.store.settings
+
             # Create output directory if it doesn't exist
-            if not os.path.exists('renamed_images'):
-                os.mkdir('renamed_images')
-        
+            if not os.path.exists(OUTPUT_DIR):
+                os.mkdir(OUTPUT_DIR)
+
         # Ensure all required keys exist
-        self._ensure_settings_keys()
-    
-    def _ensure_settings_keys(self):
-        """Ensure all required settings keys exist"""
-        required_keys = [
-            'template_texts', 
-            'big_words', 
-            'small_words', 
-            'metadata_keywords',
-            'keyword_mappings'
-        ]
-        
-        for key in required_keys:
-            if key not in st.session_state.settings:
-                if key == 'keyword_mappings':
-                    st.session_state.settings[key] = {}
-                else:
-                    st.session_state.settings[key] = []
-    
+        ensure_settings_keys(st.session_state.settings)
+
+        # The core mutates the session's settings dict in place
+        self.core = RenamerCore(st.session_state.settings, report=st.error)
+        self.max_filename_length = self.core.max_filename_length
+
+    @property
+    def settings_version(self):
+        """Increases whenever the settings change; use it to key derived caches"""
+        return self.store.version
+
+    @property
+    def word_index(self):
+        """
+        Autocomplete index over the word-block categories. Rebuilt only when
+        the settings changed without going through add_word / remove_word
+        (e.g. reloaded from disk).
+        """
+        index = _shared_word_index()
+        if index.synced_version != self.store.version:
+            index.rebuild(
+                word for category in WORD_CATEGORIES for word in st.session_state.settings[category]
+            )
+            index.synced_version = self.store.version
+        return index
+
     def save_settings(self):
-        """Save settings to a JSON file"""
-        # Settings are already saved in session state
-        pass
-    
+        """Save settings to settings.json (debounced, written in the background)"""
+        self.store.mark_dirty()
+
     def add_word(self, category, word):
         """Add a word to a category"""
-        if word and word.strip():
-            if word not in st.session_state.settings[category]:
-                st.session_state.settings[category].append(word.strip())
-                return True
+        index = self.word_index
+        if self.core.add_word(category, word):
+            self.save_settings()
+            if category in WORD_CATEGORIES:
+                index.add(word.strip())
+                index.synced_version = self.store.version
+            return True
         return False
-    
+
+    def remove_word(self, category, idx):
+        """Remove the word at idx from a category"""
+        index = self.word_index
+        word = st.session_state.settings[category].pop(idx)
+        self.save_settings()
+        if category in WORD_CATEGORIES:
+            index.remove(word)
+            index.synced_version = self.store.version
+        return word
+
     def add_keyword_mapping(self, keyword, mapped_values):
         """Add a keyword mapping"""
-        if keyword and keyword.strip():
-            # Split mapped values by comma and strip whitespace
-            values = [v.strip() for v in mapped_values.split(',') if v.strip()]
-            st.session_state.settings['keyword_mappings'][keyword.strip()] = values
+        if self.core.add_keyword_mapping(keyword, mapped_values):
+            self.save_settings()
             return True
         return False
-    
+
     def extract_metadata_keywords(self, image_file):
         """
         Extract keywords from image metadata, especially for Stable Diffusion generated images.
         Returns a dictionary with extracted and mapped keywords.
         """
-        try:
-            # Open the image and prepare to extract metadata
-            image = Image.open(image_file)
-            
-            result = {
-                'extracted': [],
-                'mapped': []
-            }
-            
-            # Try to extract EXIF data
-            exif_data = {}
-            try:
-                if hasattr(image, '_getexif') and image._getexif():
-                    exif_data = {
-                        TAGS.get(tag, tag): value
-                        for tag, value in image._getexif().items()
-                    }
-            except Exception as e:
-                pass
-                
-            # Try to extract parameters from image info (for PNG files)
-            try:
-                if 'parameters' in image.info:
-                    params = image.info['parameters']
-                    # Extract words from parameters
-                    words = re.findall(r'\b\w+\b', params)
-                    result['extracted'].extend(words)
-            except Exception as e:
-                pass
-                
-            # Try to extract XMP data (used by some AI image generators)
-            try:
-                if 'XMP' in image.info:
-                    xmp_data = image.info['XMP']
-                    # Extract words from XMP data
-                    words = re.findall(r'\b\w+\b', xmp_data.decode('utf-8', errors='ignore'))
-                    result['extracted'].extend(words)
-            except Exception as e:
-                pass
-                
-            # Try to extract PNG text chunks (often used by Stable Diffusion)
-            try:
-                for chunk in image.text.values():
-                    # Extract words from each chunk
-                    words = re.findall(r'\b\w+\b', chunk)
-                    result['extracted'].extend(words)
-            except Exception as e:
-                pass
-
-            # Filter keywords based on metadata_keywords list
-            filtered_keywords = []
-            for keyword in st.session_state.settings['metadata_keywords']:
-                if keyword in result['extracted']:
-                    filtered_keywords.append(keyword)
-                    
-                    # Add mapped keywords if available
-                    if keyword in st.session_state.settings['keyword_mappings']:
-                        result['mapped'].extend(st.session_state.settings['keyword_mappings'][keyword])
-            
-            result['extracted'] = filtered_keywords
-            
-            # Remove duplicates and sort
-            result['extracted'] = sorted(list(set(result['extracted'])))
-            result['mapped'] = sorted(list(set(result['mapped'])))
-            
-            return result
-        except Exception as e:
-            st.error(f"メタデータの抽出中にエラーが発生しました: {e}")
-            return {'extracted': [], 'mapped': []}
-    
-    def rename_files(self, files, rename_pattern, custom_numbering="{n:02d}", position='suffix'):
-        """
-        Rename multiple files based on the pattern and create a ZIP archive
-        """
-        # Create output directory if it doesn't exist
-        if not os.path.exists('renamed_images'):
-            os.mkdir('renamed_images')
-        else:
-            # Clean up existing files
-            for file in os.listdir('renamed_images'):
-                os.remove(os.path.join('renamed_images', file))
-        
-        results = {}
-        
-        # Process files
-        for i, file in enumerate(files, 1):
-            # Create the new filename
-            new_name = self._create_filename(rename_pattern, i, custom_numbering, position)
-            
-            # Get the file extension
-            _, ext = os.path.splitext(file.name)
-            
-            # Ensure the extension is included
-            new_filename = f"{new_name}{ext}"
-            
-            # Save the file with the new name
-            try:
-                image = Image.open(file)
-                save_path = os.path.join('renamed_images', new_filename)
-                image.save(save_path)
-                
-                # Record the result
-                results[file.name] = new_filename
-            except Exception as e:
-                st.error(f"ファイル {file.name} の処理中にエラーが発生しました: {e}")
-        
-        return results
-    
-    def _create_filename(self, pattern, number, custom_numbering, position):
-        """
-        Create a filename with the pattern and number
-        """
-        try:
-            # Format the number according to the custom format
-            formatted_number = custom_numbering.format(n=number)
-            
-            # Add number to the beginning or end based on position
-            if position == 'prefix':
-                return f"{formatted_number} {pattern}"
-            else:  # suffix
-                return f"{pattern} {formatted_number}"
-        except Exception as e:
-            st.error(f"ファイル名の作成中にエラーが発生しました: {e}")
-            # Fallback to simple numbering
-            return f"{pattern} {number:02d}"
+        return self.core.extract_metadata_keywords(image_file)
+
+    def start_index_job(self, files, max_workers=None, ids=None):
+        """
+        Start extracting metadata keywords for all files on a process pool.
+        Returns the running IndexJob.
+        """
+        return self.core.start_index_job(files, max_workers, ids)
+
+    def index_is_current(self, job):
+        """True if job ran with the current metadata keywords and mappings"""
+        return self.core.index_is_current(job)
+
+    def rename_files(self, files, rename_pattern, custom_numbering="{n:02d}", position='suffix',
+                     mode='copy', output_format=None, progress_callback=None, max_workers=None):
+        """
+        Rename multiple files based on the pattern and save them to renamed_images,
+        replacing the previous output
+        """
+        # Clean up existing files
+        if os.path.exists(OUTPUT_DIR):
+            for file in os.listdir(OUTPUT_DIR):
+                os.remove(os.path.join(OUTPUT_DIR, file))
+
+        return self.core.rename_files(
+            files, rename_pattern, OUTPUT_DIR, custom_numbering, position,
+            mode, output_format, progress_callback, max_workers
+        )
+
+    def link_files(self, files, rename_pattern, output_dir, custom_numbering="{n:02d}", position='suffix',
+                   progress_callback=None, max_workers=None, pairs=None):
+        """
+        Hardlink files on disk into output_dir under their new names
+        (reflink or copy when output_dir is on another volume)
+        """
+        return self.core.rename_files(
+            files, rename_pattern, output_dir, custom_numbering, position,
+            mode='link', progress_callback=progress_callback, max_workers=max_workers,
+            link_strategy=load_app_config().get_backup_strategy(), pairs=pairs
+        )
+
+    def rename_in_place(self, folder, names, rename_pattern, custom_numbering="{n:02d}", position='suffix',
+                        on_rename=None, pairs=None):
+        """
+        Rename files inside folder, journaled so the batch can be undone.
+        Returns (plan, journal).
+        """
+        return self.core.rename_in_place(
+            folder, names, rename_pattern, custom_numbering, position, on_rename, pairs=pairs
+        )
+
+    def create_archive(self, files, rename_pattern, custom_numbering="{n:02d}", position='suffix',
+                       mode='copy', output_format=None, progress_callback=None, max_workers=None, pairs=None):
+        """
+        Build a ZIP archive of the renamed files directly from the uploaded buffers.
+        Returns (archive, results); archive is a temporary file positioned at the start.
+        """
+        return self.core.create_archive(
+            files, rename_pattern, custom_numbering, position,
+            mode, output_format, progress_callback, max_workers, pairs=pairs
+        )
+
+    def plan_batch_names(self, files, pattern, keywords=None, mode='copy', output_format=None):
+        """
+        Name each file from its own metadata keywords with one template.
+        Returns (file, new_filename) pairs; raises TemplateError for an invalid pattern.
+        """
+        return self.core.plan_batch_names(files, pattern, keywords, mode, output_format)
+
+    def compile_name_template(self, rename_pattern, custom_numbering, position):
+        """
+        Compile the rename text and numbering format into a NameTemplate.
+        Raises TemplateError when the numbering format is invalid.
+        """
+        return self.core.compile_name_template(rename_pattern, custom_numbering, position)
+
+    def sample_filename(self, rename_pattern, custom_numbering, position, original_name):
+        """
+        Render the name the first file would get, before truncation
+        """
+        return self.core.sample_filename(rename_pattern, custom_numbering, position, original_name)
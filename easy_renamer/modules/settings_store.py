@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+# Edits within this many seconds of each other are written once
+DEFAULT_DEBOUNCE = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsStore:
+    """
+    Settings dict persisted to a JSON file with debounced, atomic writes.
+
+    Callers mutate store.settings in place and then call mark_dirty().
+    The change is serialized immediately on the calling thread, but written
+    only after the debounce interval, so a burst of edits costs one write.
+    Writes go to a temp file in the same directory followed by os.replace,
+    so readers never see a partial file. Changes made by other processes
+    are picked up by reload_if_changed() through the file's mtime.
+
+    version increases on every local change or reload; caches derived from
+    the settings can key on it.
+    """
+
+    def __init__(self, path, defaults=None, debounce=DEFAULT_DEBOUNCE):
+        self.path = os.path.abspath(path)
+        self.defaults = defaults or dict
+        self.debounce = debounce
+        self.settings = {}
+        self.version = 0
+        self._mtime = None
+        self._pending = None
+        self._timer = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def _stat_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """
+        Read the file, or use the defaults when it does not exist or is
+        not a valid settings file (it is replaced on the next write).
+        The settings dict is updated in place so existing references stay valid.
+        """
+        with self._lock:
+            mtime = self._stat_mtime()
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                if not isinstance(loaded, dict):
+                    raise ValueError(f"expected an object, got {type(loaded).__name__}")
+            except FileNotFoundError:
+                loaded = self.defaults()
+            except ValueError as e:
+                logger.error("Ignoring unreadable settings file %s: %s", self.path, e)
+                loaded = self.defaults()
+            self.settings.clear()
+            self.settings.update(loaded)
+            self._mtime = mtime
+            self.version += 1
+
+    def reload_if_changed(self):
+        """
+        Reload when another process has written the file since we last saw it.
+        Local edits that are not written yet take precedence.
+
+        Returns:
+            bool: True if the settings were reloaded
+        """
+        mtime = self._stat_mtime()
+        if mtime is None or mtime == self._mtime or self._pending is not None:
+            return False
+        self.load()
+        return True
+
+    def mark_dirty(self):
+        """Record an in-place change and schedule a write"""
+        with self._lock:
+            # Under the lock, so a concurrent load() cannot swap the dict mid-dump
+            payload = json.dumps(self.settings, ensure_ascii=False, indent=4)
+            self.version += 1
+            self._pending = payload
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write the pending change now, if any"""
+        with self._lock:
+            payload = self._pending
+            self._pending = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if payload is None:
+                return
+            self._write(payload)
+            self._mtime = self._stat_mtime()
+
+    def _write(self, payload):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.settings-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+@lru_cache(maxsize=None)
+def get_settings_store(path, defaults=None):
+    """Process-wide store for path, shared by all Streamlit sessions"""
+    store = SettingsStore(path, defaults)
+    # Do not lose an edit made just before the server exits
+    atexit.register(store.flush)
+    return store
@@ -0,0 +1,132 @@
+import io
+import threading
+from collections import OrderedDict, namedtuple
+from PIL import Image
+
+# Longest edge of preview images
+THUMBNAIL_SIZE = (800, 800)
+
+# Memory budget for cached previews, per cache instance
+DEFAULT_BUDGET_BYTES = 32 * 1024 * 1024
+
+ThumbnailStats = namedtuple(
+    'ThumbnailStats',
+    ['hits', 'misses', 'evictions', 'entries', 'bytes', 'budget']
+)
+
+
+# Modes Image.reduce() handles on every Pillow version we support
+REDUCE_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+
+def _reducible(image):
+    """
+    Convert modes reduce() rejects (palette, 1-bit, 16-bit, ...) to L, RGB or RGBA
+    """
+    if image.mode in REDUCE_MODES:
+        return image
+    if image.mode == '1':
+        return image.convert('L')
+    if image.mode in ('I', 'F') or image.mode.startswith('I;16'):
+        # convert('L') clips at 255, so scale the values to 8 bits first:
+        # 16-bit images by their full range, 32-bit ones by the values present
+        if image.mode.startswith('I;16'):
+            image = image.convert('I')
+            low, scale = 0, 1 / 256
+        else:
+            low, high = image.getextrema()
+            scale = 255 / (high - low) if high > low else 0
+        return image.point(lambda value: (value - low) * scale).convert('L')
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def make_thumbnail(file, max_size=THUMBNAIL_SIZE, output_format='WEBP', quality=80):
+    """
+    Decode an image at reduced size and encode a small preview.
+
+    JPEG files use draft mode so libjpeg decodes at 1/2, 1/4 or 1/8 scale.
+    Other formats are shrunk with reduce() by an integer factor before the
+    final resample, which is much cheaper than resampling the full image.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        if image.format == 'JPEG':
+            image.draft('RGB', max_size)
+
+        factor = min(image.width // max_size[0], image.height // max_size[1])
+        # Also for small images: converting 16-bit modes straight to RGB clips them
+        preview = _reducible(image)
+        if factor >= 2:
+            preview = preview.reduce(factor)
+        elif preview is image:
+            preview = image.copy()
+
+    preview.thumbnail(max_size)
+    if preview.mode not in ('RGB', 'RGBA'):
+        preview = preview.convert('RGBA' if 'A' in preview.getbands() else 'RGB')
+    if output_format == 'JPEG' and preview.mode == 'RGBA':
+        preview = preview.convert('RGB')
+
+    output = io.BytesIO()
+    preview.save(output, format=output_format, quality=quality)
+    file.seek(0)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """
+    LRU cache of encoded previews bounded by a total byte budget
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return cached preview bytes or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Store preview bytes, evicting least-recently-used entries"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            # A single preview larger than the budget is not cached
+            if len(data) > self.budget_bytes:
+                return
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_create(self, key, file, **kwargs):
+        """Return the preview for key, rendering it from file on a miss"""
+        data = self.get(key)
+        if data is None:
+            data = make_thumbnail(file, **kwargs)
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        """Current hit/miss/eviction counters and memory use"""
+        with self._lock:
+            return ThumbnailStats(
+                self.hits, self.misses, self.evictions,
+                len(self._entries), self._bytes, self.budget_bytes
+            )
@@ -1,7 +1,9 @@
 import streamlit as st
 import io
+import html
 from PIL import Image
 import base64
+from modules.name_template import NameTemplate, TemplateError
 
 def load_css():
     """
@@ -155,3 +157,130 @@ def load_css():
             inputField.addEventListener('dragover', function(e) {
                 e.preventDefault();
             });
+            
+            inputField.addEventListener('drop', function(e) {
+                e.preventDefault();
+                const word = e.dataTransfer.getData('text/plain');
+                const currentValue = inputField.value;
+                inputField.value = currentValue ? currentValue + ' ' + word : word;
+                
+                const event = new Event('input', { bubbles: true });
+                inputField.dispatchEvent(event);
+            });
+        }
+        
+        // Initialize when the DOM is ready
+        document.addEventListener('DOMContentLoaded', initWordBlocks);
+        initWordBlocks();
+    </script>
+    """
+    
+    st.markdown(css + js, unsafe_allow_html=True)
+
+# Number of word blocks rendered per category page
+WORD_BLOCKS_PER_PAGE = 60
+
+# Settings key -> (CSS class, label) for the registered word categories
+WORD_BLOCK_CATEGORIES = {
+    'template_texts': ('template', '定型文'),
+    'big_words': ('big', 'ビッグワード'),
+    'small_words': ('small', 'スモールワード'),
+}
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_word_blocks_html(cache_key, _words, css_class):
+    """
+    Return the HTML for one page of word blocks. Only cache_key (settings
+    version, category, page) is hashed; the word list itself is not, so a
+    cache hit costs the same however large the vocabulary is.
+    """
+    blocks = ''.join(
+        f'<span class="word-block {css_class}" data-word="{html.escape(word, quote=True)}">{html.escape(word)}</span>'
+        for word in _words
+    )
+    return f'<div class="word-blocks-container">{blocks}</div>'
+
+def _word_block_page(key, words, css_class, label, version):
+    """
+    Render one category as a single page of blocks with a page selector,
+    so the payload per rerun stays the same however many words exist
+    """
+    if not words:
+        return
+    
+    total_pages = (len(words) + WORD_BLOCKS_PER_PAGE - 1) // WORD_BLOCKS_PER_PAGE
+    col_label, col_page = st.columns([3, 1])
+    with col_label:
+        st.caption(f"{label} ({len(words)})")
+    page = 1
+    if total_pages > 1:
+        with col_page:
+            page = st.number_input(
+                f"{label} ページ",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                key=f"word_page_{key}",
+                label_visibility="collapsed"
+            )
+    
+    start = (page - 1) * WORD_BLOCKS_PER_PAGE
+    fragment = render_word_blocks_html(
+        (version, key, page),
+        words[start:start + WORD_BLOCKS_PER_PAGE],
+        css_class
+    )
+    st.markdown(fragment, unsafe_allow_html=True)
+
+def create_word_blocks_component(renamer, extracted_keywords):
+    """
+    Show registered words and the selected image's keywords as word blocks
+    
+    Fragments are cached by settings version, so an unchanged vocabulary
+    costs a dictionary lookup per rerun rather than rebuilding the HTML.
+    """
+    version = renamer.settings_version
+    settings = st.session_state.settings
+    
+    for key, (css_class, label) in WORD_BLOCK_CATEGORIES.items():
+        _word_block_page(key, settings.get(key, []), css_class, label, version)
+    
+    # Keywords depend on the selected image, not on the settings version
+    keywords = list(extracted_keywords or [])
+    _word_block_page('meta', keywords, 'meta', "メタデータ", tuple(keywords))
+
+def create_image_list_component(files, selected_id=None, label=None):
+    """
+    Show the file names of the current page and return the id of the selected one.
+    label(record) gives the display name (e.g. numbered for repeated names).
+    """
+    ids = [file.id for file in files]
+    if not ids:
+        return selected_id
+    
+    labels = {file.id: (label(file) if label else file.name) for file in files}
+    index = ids.index(selected_id) if selected_id in labels else 0
+    return st.radio(
+        "画像を選択",
+        ids,
+        index=index,
+        format_func=labels.get,
+        key="image_list_radio",
+        label_visibility="collapsed"
+    )
+
+def create_format_preview(custom_numbering, position, sample_text):
+    """
+    Show how the first few names look with the numbering format
+    """
+    try:
+        template = NameTemplate.from_numbering(custom_numbering, sample_text, position)
+    except TemplateError:
+        # The rename tab reports the error itself
+        return
+    
+    examples = [template.render({'n': n, 'text': sample_text, 'stem': sample_text}) for n in (1, 2, 3)]
+    st.markdown(
+        f'<div class="format-preview">{html.escape(" / ".join(examples))} ...</div>',
+        unsafe_allow_html=True
+    )
@@ -0,0 +1,221 @@
+import bisect
+
+# Sort orders for the image list; ties are broken by id so paging is stable.
+# 'added' is the id order itself and needs no extra list.
+SORT_KEYS = {
+    'added': None,
+    'name': lambda record: (record.name.lower(), record.name),
+    'size': lambda record: record.size,
+}
+
+SORT_LABELS = {
+    'added': "追加順",
+    'name': "名前順",
+    'size': "サイズ順",
+}
+
+
+class CatalogRecord:
+    """
+    One image in the catalog.
+
+    The bytes stay on disk; the record only holds what the list, the
+    preview and the rename need, plus references into the caches built
+    from the file: digest (content hash, set when the metadata index has
+    read the file, see KeywordIndex.sync), metadata (the
+    keyword result together with the settings version it was computed
+    for) and thumbnail (the ThumbnailCache key).
+    """
+
+    __slots__ = ('id', 'name', 'path', 'size', 'file_id', 'digest', 'metadata', 'thumbnail')
+
+    def __init__(self, record_id, name, path, size, file_id=None):
+        self.id = record_id
+        self.name = name
+        self.path = path
+        self.size = size
+        self.file_id = file_id
+        self.digest = None
+        self.metadata = None
+        # The thumbnail stays valid across renames, so it is keyed by identity, not path
+        self.thumbnail = file_id or path
+
+    def open(self):
+        """Open the file for reading"""
+        return open(self.path, 'rb')
+
+    def cached_metadata(self, version):
+        """Keyword result stored for this settings version, or None"""
+        if self.metadata is not None and self.metadata[0] == version:
+            return self.metadata[1]
+        return None
+
+    def store_metadata(self, version, result):
+        self.metadata = (version, result)
+
+
+class UploadCatalog:
+    """
+    Indexed list of CatalogRecords.
+
+    Records are found by id or by name through dicts, and each sort order
+    is a sorted list of (key, id) built on first use and then kept up to
+    date with bisect, so selecting an image or fetching a page costs the
+    same for 50 files as for 50,000. Ids are never reused, not even after
+    clear(), so a stale selection cannot point at a different file.
+    Files with the same name get separate records.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._ids = []
+        self._by_name = {}
+        self._orders = {}
+        self._subset_cache = None
+        self._next_id = 0
+        # Increases on every add, rename and clear; use it to key derived state
+        self.version = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        records = self._records
+        return (records[record_id] for record_id in self._ids)
+
+    def __getitem__(self, index):
+        return self._records[self._ids[index]]
+
+    def add(self, name, path, size, file_id=None):
+        """
+        Register a file and return its record
+        """
+        record = CatalogRecord(self._next_id, name, path, size, file_id)
+        self._next_id += 1
+        self.version += 1
+        self._records[record.id] = record
+        self._ids.append(record.id)
+        self._by_name.setdefault(name, []).append(record.id)
+        self._subset_cache = None
+        for sort, keys in self._orders.items():
+            bisect.insort(keys, (SORT_KEYS[sort](record), record.id))
+        return record
+
+    def _discard_order_keys(self, record):
+        for sort, keys in self._orders.items():
+            key = (SORT_KEYS[sort](record), record.id)
+            position = bisect.bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+
+    def rename(self, record_id, name, path):
+        """Point a record at its new name after a rename on disk"""
+        record = self._records[record_id]
+        self.version += 1
+        self._discard_order_keys(record)
+        ids = self._by_name[record.name]
+        ids.remove(record_id)
+        if not ids:
+            del self._by_name[record.name]
+        record.name = name
+        record.path = path
+        self._by_name.setdefault(name, []).append(record_id)
+        self._subset_cache = None
+        for sort, keys in self._orders.items():
+            bisect.insort(keys, (SORT_KEYS[sort](record), record_id))
+
+    def get(self, record_id):
+        """Return the record with the given id, or None"""
+        return self._records.get(record_id)
+
+    def find(self, name):
+        """Return the first record with the given name, or None"""
+        ids = self._by_name.get(name)
+        return self._records[ids[0]] if ids else None
+
+    def label(self, record):
+        """Display name; repeated names are numbered so they can be told apart"""
+        ids = self._by_name.get(record.name, ())
+        if len(ids) < 2:
+            return record.name
+        return f"{record.name} ({ids.index(record.id) + 1})"
+
+    def _order(self, sort):
+        """Sorted (key, id) list for a sort order, built on first use"""
+        keys = self._orders.get(sort)
+        if keys is None:
+            key_func = SORT_KEYS[sort]
+            records = self._records
+            keys = sorted((key_func(records[record_id]), record_id) for record_id in self._ids)
+            self._orders[sort] = keys
+        return keys
+
+    def page_count(self, page_size):
+        return max(1, (len(self._ids) + page_size - 1) // page_size)
+
+    def _subset_order(self, subset, sort):
+        """
+        subset (a sorted id array, e.g. from KeywordIndex.filter) in a sort
+        order. Kept for the last subset so paging does not filter again.
+        """
+        cached = self._subset_cache
+        if cached is not None and cached[0] is subset and cached[1] == sort:
+            return cached[2]
+        if SORT_KEYS[sort] is None:
+            entries = subset
+        else:
+            members = set(subset)
+            entries = [entry for entry in self._order(sort) if entry[1] in members]
+        self._subset_cache = (subset, sort, entries)
+        return entries
+
+    def page(self, page, page_size, sort='added', reverse=False, subset=None):
+        """
+        Records for one page of the list (page is 1-based). With subset,
+        only those ids are listed.
+        """
+        # 'added' slices the id list; other orders slice their (key, id) list
+        added_order = SORT_KEYS[sort] is None
+        if subset is not None:
+            entries = self._subset_order(subset, sort)
+        else:
+            entries = self._ids if added_order else self._order(sort)
+        start = (page - 1) * page_size
+        if reverse:
+            end = len(entries) - start
+            selected = entries[max(0, end - page_size):max(0, end)][::-1]
+        else:
+            selected = entries[start:start + page_size]
+        if not added_order:
+            selected = [record_id for _, record_id in selected]
+        return [self._records[record_id] for record_id in selected]
+
+    def records(self, sort='added'):
+        """Every record in the given order"""
+        return self.page(1, max(len(self._ids), 1), sort)
+
+    def ids(self):
+        """Record ids in the order they were added"""
+        return list(self._ids)
+
+    def paths(self):
+        """File paths in the order they were added, e.g. for RenamerCore or IndexJob"""
+        records = self._records
+        return [records[record_id].path for record_id in self._ids]
+
+    def names(self):
+        """File names in the order they were added"""
+        records = self._records
+        return [records[record_id].name for record_id in self._ids]
+
+    def total_size(self):
+        return sum(record.size for record in self._records.values())
+
+    def clear(self):
+        """Forget every record; ids keep counting up"""
+        self.version += 1
+        self._records = {}
+        self._ids = []
+        self._by_name = {}
+        self._orders = {}
+        self._subset_cache = None
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import weakref
+
+from modules.upload_catalog import UploadCatalog
+
+# Chunk size used when spooling an upload to disk
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadStore:
+    """
+    Per-session directory of spooled uploads.
+
+    add() streams an uploaded file to disk in chunks and registers it in
+    the catalog; once every upload is spooled the caller resets the
+    uploader widget so Streamlit releases its in-memory copy. The directory
+    is removed by cleanup(), or when the store is garbage-collected with
+    its session.
+    """
+
+    def __init__(self, root=None):
+        self.directory = tempfile.mkdtemp(prefix='easy_renamer_uploads_', dir=root)
+        self.catalog = UploadCatalog()
+        self._file_ids = set()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def __iter__(self):
+        return iter(self.catalog)
+
+    def __getitem__(self, index):
+        return self.catalog[index]
+
+    def add(self, uploaded_file):
+        """
+        Spool one upload to disk. Uploads already stored (same file_id) are skipped.
+
+        Returns:
+            CatalogRecord or None: the new record, or None if already stored
+        """
+        file_id = getattr(uploaded_file, 'file_id', None)
+        if file_id is not None and file_id in self._file_ids:
+            return None
+
+        # One subdirectory per upload keeps the original name, even for duplicates
+        slot = tempfile.mkdtemp(dir=self.directory)
+        path = os.path.join(slot, os.path.basename(uploaded_file.name))
+        uploaded_file.seek(0)
+        with open(path, 'wb') as out:
+            shutil.copyfileobj(uploaded_file, out, SPOOL_CHUNK_SIZE)
+
+        record = self.catalog.add(uploaded_file.name, path, os.path.getsize(path), file_id)
+        if file_id is not None:
+            self._file_ids.add(file_id)
+        return record
+
+    def page(self, page, page_size, sort='added', reverse=False, subset=None):
+        """Records for one page of the list (page is 1-based)"""
+        return self.catalog.page(page, page_size, sort, reverse, subset)
+
+    def get(self, record_id):
+        """Return the record with the given id, or None"""
+        return self.catalog.get(record_id)
+
+    def find(self, name):
+        """Return the first record with the given name, or None"""
+        return self.catalog.find(name)
+
+    def label(self, record):
+        return self.catalog.label(record)
+
+    def ids(self):
+        """Record ids in upload order, aligned with paths()"""
+        return self.catalog.ids()
+
+    def paths(self):
+        """Spooled file paths in upload order, e.g. for RenamerCore or IndexJob"""
+        return self.catalog.paths()
+
+    def total_size(self):
+        return self.catalog.total_size()
+
+    def clear(self):
+        """Delete all spooled files but keep the store usable"""
+        for entry in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+        self.catalog.clear()
+        self._file_ids = set()
+
+    def cleanup(self):
+        """Delete the whole directory"""
+        self._finalizer()
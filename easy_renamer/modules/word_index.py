@@ -0,0 +1,163 @@
+import bisect
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+
+DEFAULT_LIMIT = 20
+
+
+def normalize(text):
+    """Fold width and case so 'ＡＩ', 'AI' and 'ai' match each other"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def _grams(key):
+    """Single characters and bigrams of a normalized word"""
+    grams = set(key)
+    grams.update(key[i:i + 2] for i in range(len(key) - 1))
+    return grams
+
+
+class WordIndex:
+    """
+    Autocomplete index over the rename vocabulary.
+
+    Prefix matches come from a sorted list of normalized keys (bisect,
+    O(log n + k)). Substring matches, which matter for Japanese where a
+    word such as '美少女' should be found by '少女', come from an n-gram
+    index: every character and bigram maps to the words containing it,
+    and a query intersects the posting sets of its own grams.
+    Words can be added and removed one at a time.
+    """
+
+    def __init__(self, words=()):
+        self._keys = []
+        self._by_length = []
+        self._words = {}
+        self._counts = {}
+        self._postings = defaultdict(set)
+        self._lock = threading.Lock()
+        # Settings version the index reflects (see EasyRenamer.word_index)
+        self.synced_version = None
+        self.rebuild(words)
+
+    def rebuild(self, words):
+        """Replace the whole vocabulary, sorting once instead of per word"""
+        counts = {}
+        for word in words:
+            if word:
+                counts[word] = counts.get(word, 0) + 1
+        keys = {word: normalize(word) for word in counts}
+        postings = defaultdict(set)
+        for word, key in keys.items():
+            for gram in _grams(key):
+                postings[gram].add(word)
+
+        with self._lock:
+            self._counts = counts
+            self._words = keys
+            self._keys = sorted((key, word) for word, key in keys.items())
+            self._by_length = sorted((len(word), key, word) for word, key in keys.items())
+            self._postings = postings
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word):
+        """Add a word; words present in several categories are counted"""
+        if not word:
+            return
+        with self._lock:
+            if word in self._counts:
+                self._counts[word] += 1
+                return
+            self._counts[word] = 1
+            key = normalize(word)
+            self._words[word] = key
+            bisect.insort(self._keys, (key, word))
+            bisect.insort(self._by_length, (len(word), key, word))
+            for gram in _grams(key):
+                self._postings[gram].add(word)
+
+    def remove(self, word):
+        """Remove one occurrence of a word"""
+        with self._lock:
+            count = self._counts.get(word)
+            if count is None:
+                return
+            if count > 1:
+                self._counts[word] = count - 1
+                return
+            del self._counts[word]
+            key = self._words.pop(word)
+            position = bisect.bisect_left(self._keys, (key, word))
+            if position < len(self._keys) and self._keys[position] == (key, word):
+                del self._keys[position]
+            entry = (len(word), key, word)
+            position = bisect.bisect_left(self._by_length, entry)
+            if position < len(self._by_length) and self._by_length[position] == entry:
+                del self._by_length[position]
+            for gram in _grams(key):
+                posting = self._postings[gram]
+                posting.discard(word)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Return up to limit words for query: prefix matches in sorted order,
+        then other words containing the query, shortest first
+        """
+        query = normalize(query.strip())
+        if not query:
+            return []
+
+        with self._lock:
+            results = []
+            position = bisect.bisect_left(self._keys, (query,))
+            while len(results) < limit and position < len(self._keys):
+                key, word = self._keys[position]
+                if not key.startswith(query):
+                    break
+                results.append(word)
+                position += 1
+            if len(results) == limit:
+                return results
+
+            # Intersect the rarest grams first so the candidate set stays small
+            postings = []
+            for gram in _grams(query) if len(query) > 1 else (query,):
+                posting = self._postings.get(gram)
+                if not posting:
+                    return results
+                postings.append(posting)
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:]) if len(postings) > 1 else postings[0]
+            words = self._words
+            if len(query) > 2:
+                # Sharing all bigrams does not guarantee the bigrams are adjacent
+                candidates = {word for word in candidates if query in words[word]}
+
+            seen = set(results)
+            wanted = limit - len(results)
+
+            # Common grams (e.g. 'ー') match a large share of the vocabulary:
+            # walking the length-ordered list reaches enough of them sooner
+            # than ranking every candidate. Give up after len(candidates) steps.
+            if len(candidates) ** 2 > len(self._by_length) * limit:
+                found = []
+                for steps, (_, _, word) in enumerate(self._by_length):
+                    if steps > len(candidates):
+                        break
+                    if word in candidates and word not in seen:
+                        found.append(word)
+                        if len(found) == wanted:
+                            results.extend(found)
+                            return results
+
+            matches = (
+                (len(word), words[word], word) for word in candidates if word not in seen
+            )
+            results.extend(word for _, _, word in heapq.nsmallest(wanted, matches))
+            return results
@@ -0,0 +1,103 @@
+import errno
+import os
+import shutil
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux の FICLONE ioctl (btrfs / XFS / bcachefs などのコピーオンライト複製)
+FICLONE = 0x40049409
+
+BACKUP_STRATEGIES = ('auto', 'hardlink', 'reflink', 'copy')
+
+BACKUP_STRATEGY_LABELS = {
+    'auto': '自動 (ハードリンク → reflink → コピー)',
+    'hardlink': 'ハードリンク',
+    'reflink': 'reflink (コピーオンライト)',
+    'copy': '通常コピー',
+}
+
+_FALLBACK_ORDER = {
+    'auto': ('hardlink', 'reflink', 'copy'),
+    'hardlink': ('hardlink',),
+    'reflink': ('reflink',),
+    'copy': ('copy',),
+}
+
+
+def create_backup(src, dst, strategy='auto'):
+    """
+    ファイルのバックアップを作成
+
+    リネームはファイルの中身を変更しないため、同一ボリューム上では
+    ハードリンクで十分なバックアップになる。'auto' ではハードリンク、
+    reflink、通常コピーの順に試す。
+
+    同じフォルダの一時ファイルに作成してから置き換えるため、失敗しても
+    既存のバックアップは残る。
+
+    Args:
+        src (str): バックアップ元のパス
+        dst (str): バックアップ先のパス (既存の場合は置き換え)
+        strategy (str): 'auto', 'hardlink', 'reflink', 'copy' のいずれか
+
+    Returns:
+        str: 実際に使われた方式
+
+    Raises:
+        ValueError: 不明な方式が指定された場合
+        OSError: すべての方式が失敗した場合
+    """
+    if strategy not in _FALLBACK_ORDER:
+        raise ValueError(f"不明なバックアップ方式です: {strategy}")
+
+    directory, name = os.path.split(dst)
+    tmp = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+    last_error = None
+    for method in _FALLBACK_ORDER[strategy]:
+        try:
+            _METHODS[method](src, tmp)
+        except OSError as e:
+            last_error = e
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            continue
+        os.replace(tmp, dst)
+        # dst がすでに同じファイルへのハードリンクだと rename は何もしない
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        return method
+    raise last_error
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "reflink はこの環境では使用できません")
+    with open(src, 'rb') as src_file:
+        try:
+            with open(dst, 'wb') as dst_file:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _copy(src, dst):
+    shutil.copy2(src, dst)
+
+
+_METHODS = {
+    'hardlink': _hardlink,
+    'reflink': _reflink,
+    'copy': _copy,
+}
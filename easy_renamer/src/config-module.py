@@ -1,13 +1,16 @@
 import json
 import os
 
+# app.py と CLI も modules.core.load_app_config からこのファイルを読む
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'config-json.json')
+
 class AppConfig:
-    def __init__(self, config_path='configs/config.json'):
+    def __init__(self, config_path=CONFIG_PATH):
         """
         アプリケーション設定クラスの初期化
         
         Args:
-            config_path (str): 設定ファイルのパス
+            config_path (str): 設定ファイルのパス. デフォルトは共有の config/config-json.json
         """
         self.config_path = config_path
         self.config = self.load_config()
@@ -24,22 +27,36 @@ class AppConfig:
                 return json.load(f)
         except FileNotFoundError:
             return self._create_default_config()
+        except ValueError:
+            # 壊れたファイルは上書きせず、デフォルト値で動かす
+            return self._default_config()
     
     def _create_default_config(self):
         """
-        デフォルト設定を作成
+        デフォルト設定を作成して保存
+        
+        Returns:
+            dict: デフォルトの設定
+        """
+        default_config = self._default_config()
+        self.save_config(default_config)
+        return default_config
+    
+    @staticmethod
+    def _default_config():
+        """
+        デフォルト設定
         
         Returns:
             dict: デフォルトの設定
         """
-        default_config = {
+        return {
             'default_folder': '',
             'max_filename_length': 255,
             'allowed_extensions': ['.jpg', '.jpeg', '.png', '.webp'],
-            'backup_folder': 'backup'
+            'backup_folder': 'backup',
+            'backup_strategy': 'auto'
         }
-        self.save_config(default_config)
-        return default_config
     
     def get(self, key, default=None):
         """
@@ -65,6 +82,30 @@ class AppConfig:
         self.config[key] = value
         self.save_config()
     
+    def get_backup_folder(self, image_folder):
+        """
+        バックアップフォルダのパスを取得
+        
+        Args:
+            image_folder (str): 画像フォルダのパス. 相対パスの設定はこのフォルダ基準.
+        
+        Returns:
+            str: バックアップフォルダのパス
+        """
+        backup_folder = self.get('backup_folder', 'backup')
+        if os.path.isabs(backup_folder):
+            return backup_folder
+        return os.path.join(image_folder, backup_folder)
+    
+    def get_backup_strategy(self):
+        """
+        バックアップ方式を取得
+        
+        Returns:
+            str: 'auto', 'hardlink', 'reflink', 'copy' のいずれか
+        """
+        return self.get('backup_strategy', 'auto')
+    
     def save_config(self, config=None):
         """
         設定をJSONファイルに保存
@@ -0,0 +1,180 @@
+import bisect
+import os
+import threading
+from collections import namedtuple
+
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+FolderEntry = namedtuple('FolderEntry', ['name', 'size', 'mtime'])
+
+# 並び順ごとのソートキー (名前は同値時の順序を安定させるため)
+SORT_KEYS = {
+    'name': lambda entry: (entry.name.lower(), entry.name),
+    'mtime': lambda entry: (entry.mtime, entry.name),
+    'size': lambda entry: (entry.size, entry.name),
+}
+
+
+class FolderIndex:
+    def __init__(self, folder, extensions=SUPPORTED_EXTENSIONS):
+        """
+        フォルダ内画像のインデックスの初期化
+
+        os.scandir で一度だけ走査し、ファイルごとに名前・サイズ・更新日時を保持する。
+        リネームや追加・削除はインデックスを差分更新するため、再走査は不要。
+
+        Args:
+            folder (str): 画像フォルダのパス
+            extensions (tuple): 対象とする拡張子
+        """
+        self.folder = folder
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.entries = {}
+        self._sorted = {}
+        self._lock = threading.RLock()
+
+    def scan(self):
+        """
+        フォルダを走査してインデックスを作り直す
+
+        Returns:
+            int: 登録された画像数
+        """
+        entries = {}
+        with os.scandir(self.folder) as iterator:
+            for dir_entry in iterator:
+                if not self._is_image(dir_entry.name):
+                    continue
+                try:
+                    if not dir_entry.is_file():
+                        continue
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                entries[dir_entry.name] = FolderEntry(dir_entry.name, stat.st_size, stat.st_mtime)
+
+        with self._lock:
+            self.entries = entries
+            self._sorted = {}
+        return len(entries)
+
+    def _is_image(self, name):
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def add(self, name):
+        """
+        1ファイルだけ stat してインデックスに追加(既存なら更新)
+
+        Args:
+            name (str): ファイル名
+
+        Returns:
+            FolderEntry or None: 追加したエントリ. 対象外や存在しない場合はNone.
+        """
+        if not self._is_image(name):
+            return None
+        try:
+            stat = os.stat(os.path.join(self.folder, name))
+        except OSError:
+            self.remove(name)
+            return None
+
+        entry = FolderEntry(name, stat.st_size, stat.st_mtime)
+        with self._lock:
+            self._discard(name)
+            self.entries[name] = entry
+            for sort, keys in self._sorted.items():
+                bisect.insort(keys, (SORT_KEYS[sort](entry), name))
+        return entry
+
+    def remove(self, name):
+        """
+        インデックスからファイルを削除
+
+        Args:
+            name (str): ファイル名
+        """
+        with self._lock:
+            self._discard(name)
+
+    def _discard(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return
+        for sort, keys in self._sorted.items():
+            key = (SORT_KEYS[sort](entry), name)
+            position = bisect.bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+
+    def rename(self, old_name, new_name):
+        """
+        リネーム後のインデックス差分更新
+
+        Args:
+            old_name (str): 旧ファイル名
+            new_name (str): 新ファイル名
+        """
+        with self._lock:
+            self._discard(old_name)
+            self.add(new_name)
+
+    def _sorted_keys(self, sort):
+        """並び順ごとのソート済みキー. 初回のみソートし、以降は差分で維持する"""
+        keys = self._sorted.get(sort)
+        if keys is None:
+            key_func = SORT_KEYS[sort]
+            keys = sorted((key_func(entry), entry.name) for entry in self.entries.values())
+            self._sorted[sort] = keys
+        return keys
+
+    def page_count(self, page_size):
+        """
+        ページ数を取得
+
+        Args:
+            page_size (int): 1ページあたりの件数
+
+        Returns:
+            int: ページ数 (最低1)
+        """
+        return max(1, (len(self.entries) + page_size - 1) // page_size)
+
+    def page(self, page, page_size, sort='name', reverse=False):
+        """
+        並び替えた一覧の1ページ分を取得
+
+        Args:
+            page (int): ページ番号 (1始まり)
+            page_size (int): 1ページあたりの件数
+            sort (str): 'name', 'mtime', 'size' のいずれか
+            reverse (bool): 降順にするかどうか
+
+        Returns:
+            list: FolderEntry のリスト
+        """
+        with self._lock:
+            keys = self._sorted_keys(sort)
+            start = (page - 1) * page_size
+            if reverse:
+                end = len(keys) - start
+                selected = keys[max(0, end - page_size):max(0, end)][::-1]
+            else:
+                selected = keys[start:start + page_size]
+            return [self.entries[name] for _, name in selected]
+
+    def names(self):
+        """
+        登録済みファイル名の集合を取得
+
+        Returns:
+            set: ファイル名
+        """
+        with self._lock:
+            return set(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
@@ -0,0 +1,224 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import weakref
+from collections import deque
+
+# inotify イベントマスク (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+
+def _load_inotify():
+    """
+    libc の inotify 関数を読み込む
+
+    Returns:
+        ctypes.CDLL or None: inotify が使えない環境ではNone
+    """
+    if not hasattr(os, 'O_NONBLOCK'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FolderWatcher:
+    def __init__(self, index, on_change=None, poll_interval=2.0):
+        """
+        画像フォルダ監視クラスの初期化
+
+        inotify が使える環境では作成・移動・削除イベントを1件ずつ
+        FolderIndex に反映する。使えない環境ではフォルダの更新日時を
+        ポーリングし、変化があった時のみ差分を反映する。
+
+        Args:
+            index (FolderIndex): 更新対象のインデックス
+            on_change (callable, optional): 変化したファイル名を受け取るコールバック
+            poll_interval (float): ポーリング間隔(秒)
+        """
+        self.index = index
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def start(self):
+        """
+        監視を開始
+
+        Returns:
+            FolderWatcher: 自身
+        """
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                wd = libc.inotify_add_watch(fd, os.fsencode(self.index.folder), WATCH_MASK)
+                if wd >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+
+        if self._fd is not None:
+            self.mode = 'inotify'
+            target = self._run_inotify
+        else:
+            self.mode = 'polling'
+            target = self._run_polling
+
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """監視を停止"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _notify(self, name):
+        if self.on_change is not None:
+            self.on_change(name)
+
+    def _run_inotify(self):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self._fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not self._apply_events(data):
+                    break
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _apply_events(self, data):
+        """
+        inotify イベント列をインデックスに反映
+
+        Args:
+            data (bytes): os.read で読んだイベント列
+
+        Returns:
+            bool: 監視を続けるかどうか (フォルダ自体が消えた場合はFalse)
+        """
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\x00'))
+            offset += length
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                return False
+            if mask & IN_Q_OVERFLOW:
+                # イベントが溢れた場合のみ全体を再走査
+                self.index.scan()
+                self._notify(None)
+                continue
+            if not name or mask & IN_ISDIR:
+                continue
+
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self.index.remove(name)
+            elif mask & (IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.index.add(name)
+            self._notify(name)
+        return True
+
+    def _run_polling(self):
+        last_mtime = None
+        while not self._stop.wait(self.poll_interval if last_mtime is not None else 0):
+            try:
+                mtime = os.stat(self.index.folder).st_mtime_ns
+            except OSError:
+                break
+            if mtime == last_mtime:
+                continue
+            if last_mtime is not None:
+                self._apply_listing()
+            last_mtime = mtime
+
+    def _apply_listing(self):
+        """フォルダ内の名前一覧とインデックスの差分を反映"""
+        with os.scandir(self.index.folder) as iterator:
+            current = {entry.name for entry in iterator}
+        known = self.index.names()
+
+        for name in known - current:
+            self.index.remove(name)
+            self._notify(name)
+        for name in current - known:
+            if self.index.add(name) is not None:
+                self._notify(name)
+
+
+class WatchSession:
+    def __init__(self, index):
+        """
+        セッションごとのフォルダ監視
+
+        監視スレッドは変化したファイル名をキューに積むだけで、呼び出し側の
+        状態 (Streamlit の session_state など) には触れない。スクリプト側が
+        再実行のたびに drain() で取り出して反映する。このオブジェクトが
+        セッションと共に破棄されると監視も停止する。
+
+        Args:
+            index (FolderIndex): 監視するフォルダのインデックス
+        """
+        self.index = index
+        # deque の append/popleft はスレッド間で安全
+        self._changes = deque()
+        self.watcher = FolderWatcher(index, on_change=self._changes.append).start()
+        # 監視スレッドはこのオブジェクトを参照しないため、セッション終了時に回収される
+        self._finalizer = weakref.finalize(self, self.watcher.stop)
+
+    @property
+    def mode(self):
+        return self.watcher.mode
+
+    def drain(self):
+        """
+        前回以降に変化したファイル名を取り出す
+
+        Returns:
+            list: 変化したファイル名 (全体を再走査した場合は None を含む)
+        """
+        changes = []
+        while self._changes:
+            changes.append(self._changes.popleft())
+        return changes
+
+    def stop(self):
+        """監視を停止"""
+        self._finalizer()
@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+JOURNAL_DIR_NAME = '.rename_journal'
+
+# ジャーナルの状態
+STATUS_PENDING = 'pending'
+STATUS_COMMITTED = 'committed'
+STATUS_ROLLED_BACK = 'rolled_back'
+
+STATUS_LABELS = {
+    STATUS_PENDING: '中断',
+    STATUS_COMMITTED: '完了',
+    STATUS_ROLLED_BACK: '取り消し済み',
+}
+
+
+def _fsync_dir(path):
+    """ディレクトリエントリの変更を永続化 (対応しないOSでは何もしない)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class RenameJournal:
+    def __init__(self, path):
+        """
+        一括リネームの先行書き込みジャーナル
+
+        1行目がヘッダ、続いて計画した (旧名, 新名) の組、最後に状態レコードを
+        JSON Lines で記録する。fsync は計画の書き込み時と状態の更新時に
+        1回ずつのみ行い、ファイルごとには行わない。
+
+        Args:
+            path (str): ジャーナルファイルのパス
+        """
+        self.path = path
+        self.folder = None
+        self.created = None
+        self.pairs = []
+        self.status = STATUS_PENDING
+
+    @classmethod
+    def create(cls, folder, pairs, journal_dir=None):
+        """
+        計画したリネームをジャーナルに書き込み、1回だけ fsync する
+
+        Args:
+            folder (str): 画像フォルダのパス
+            pairs (list): (旧ファイル名, 新ファイル名) のリスト (実行順)
+            journal_dir (str, optional): ジャーナル保存先. デフォルトはフォルダ内の .rename_journal
+
+        Returns:
+            RenameJournal: 作成したジャーナル
+        """
+        journal_dir = journal_dir or os.path.join(folder, JOURNAL_DIR_NAME)
+        os.makedirs(journal_dir, exist_ok=True)
+        created = datetime.now()
+        path = os.path.join(journal_dir, f"{created.strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+
+        with open(path, 'w', encoding='utf-8') as f:
+            header = {'type': 'begin', 'folder': os.path.abspath(folder),
+                      'created': created.isoformat(), 'count': len(pairs)}
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            f.writelines(
+                json.dumps([old, new], ensure_ascii=False) + '\n' for old, new in pairs
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(journal_dir)
+
+        journal = cls(path)
+        journal.folder = os.path.abspath(folder)
+        journal.created = created.isoformat()
+        journal.pairs = list(pairs)
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """
+        ジャーナルファイルを読み込む
+
+        Args:
+            path (str): ジャーナルファイルのパス
+
+        Returns:
+            RenameJournal: 読み込んだジャーナル
+        """
+        journal = cls(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 書き込み途中でクラッシュした最終行
+                    break
+                if isinstance(record, list):
+                    journal.pairs.append(tuple(record))
+                elif record.get('type') == 'begin':
+                    journal.folder = record['folder']
+                    journal.created = record.get('created')
+                elif record.get('type') == 'status':
+                    journal.status = record['status']
+        return journal
+
+    def _mark(self, status):
+        """状態レコードを追記して fsync する"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'status', 'status': status}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.status = status
+
+    def commit(self):
+        """
+        実行済みのリネームをディレクトリごと永続化し、完了を記録
+        """
+        _fsync_dir(self.folder)
+        self._mark(STATUS_COMMITTED)
+
+    def replay(self, on_rename=None):
+        """
+        中断したバッチを最後まで実行 (1パス)
+
+        旧名が残り新名が無い組だけをリネームするため、何度実行しても安全。
+
+        Args:
+            on_rename (callable, optional): (旧名, 新名) を受け取るコールバック
+
+        Returns:
+            int: 実行したリネーム数
+        """
+        count = 0
+        for old, new in self.pairs:
+            old_path = os.path.join(self.folder, old)
+            new_path = os.path.join(self.folder, new)
+            if os.path.lexists(old_path) and not os.path.lexists(new_path):
+                os.rename(old_path, new_path)
+                count += 1
+                if on_rename is not None:
+                    on_rename(old, new)
+        self.commit()
+        return count
+
+    def rollback(self, on_rename=None):
+        """
+        バッチを逆順に取り消す (1パス)
+
+        新名が存在し旧名が無い組だけを戻すため、中断したバッチにも使える。
+
+        Args:
+            on_rename (callable, optional): (戻す前の名前, 戻した後の名前) を受け取るコールバック
+
+        Returns:
+            int: 戻したリネーム数
+        """
+        count = 0
+        for old, new in reversed(self.pairs):
+            old_path = os.path.join(self.folder, old)
+            new_path = os.path.join(self.folder, new)
+            if os.path.lexists(new_path) and not os.path.lexists(old_path):
+                os.rename(new_path, old_path)
+                count += 1
+                if on_rename is not None:
+                    on_rename(new, old)
+        _fsync_dir(self.folder)
+        self._mark(STATUS_ROLLED_BACK)
+        return count
+
+
+def run_batch(folder, pairs, journal_dir=None, on_rename=None):
+    """
+    ジャーナルに記録してから一括リネームを実行
+
+    既存ファイルを上書きしそうな場合はその時点で停止し、ジャーナルは
+    中断状態のまま残る (rollback / replay で復旧できる)。
+
+    Args:
+        folder (str): 画像フォルダのパス
+        pairs (list): (旧ファイル名, 新ファイル名) のリスト (実行順)
+        journal_dir (str, optional): ジャーナル保存先
+        on_rename (callable, optional): (旧名, 新名) を受け取るコールバック
+
+    Returns:
+        RenameJournal: 完了したジャーナル
+
+    Raises:
+        FileExistsError: リネーム先が既に存在する場合
+    """
+    journal = RenameJournal.create(folder, pairs, journal_dir)
+
+    for old, new in journal.pairs:
+        new_path = os.path.join(folder, new)
+        if os.path.lexists(new_path):
+            raise FileExistsError(f"リネーム先が既に存在します: {new}")
+        os.rename(os.path.join(folder, old), new_path)
+        if on_rename is not None:
+            on_rename(old, new)
+
+    journal.commit()
+    return journal
+
+
+def find_journals(folder, journal_dir=None, limit=None):
+    """
+    フォルダのジャーナル一覧を新しい順に取得
+
+    ファイル名 (作成日時) で並べてから読み込むため、limit を指定すると
+    新しいものだけを読み込む。
+
+    Args:
+        folder (str): 画像フォルダのパス
+        journal_dir (str, optional): ジャーナル保存先
+        limit (int, optional): 読み込む最大件数
+
+    Returns:
+        list: RenameJournal のリスト
+    """
+    journal_dir = journal_dir or os.path.join(folder, JOURNAL_DIR_NAME)
+    if not os.path.isdir(journal_dir):
+        return []
+    names = sorted((name for name in os.listdir(journal_dir) if name.endswith('.jsonl')), reverse=True)
+    if limit is not None:
+        names = names[:limit]
+    return [RenameJournal.load(os.path.join(journal_dir, name)) for name in names]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="一括リネームのジャーナル操作")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help="ジャーナル一覧を表示")
+    list_parser.add_argument('folder')
+
+    for command, help_text in (('rollback', "バッチを取り消す"), ('replay', "中断したバッチを完了させる")):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument('journal', help="ジャーナルファイルのパス")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for journal in find_journals(args.folder):
+            print(f"{journal.path}\t{STATUS_LABELS[journal.status]}\t{len(journal.pairs)} 件")
+        return 0
+
+    journal = RenameJournal.load(args.journal)
+    if args.command == 'rollback':
+        print(f"{journal.rollback()} 件を元に戻しました")
+    else:
+        print(f"{journal.replay()} 件をリネームしました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import os
+import uuid
+from collections import deque, namedtuple
+
+# 差分プレビューの1行 (status: 'ok' / 'adjusted' / 'unchanged')
+PlanChange = namedtuple('PlanChange', ['old', 'requested', 'new', 'status'])
+
+STATUS_LABELS = {
+    'ok': '',
+    'adjusted': '重複のため変更',
+    'unchanged': '変更なし',
+}
+
+
+def _split(name):
+    stem, ext = os.path.splitext(name)
+    return stem, ext
+
+
+def fit_stem(stem, suffix, max_bytes):
+    """
+    番号と拡張子を付けても max_bytes (UTF-8) に収まるように stem を切り詰める
+
+    Args:
+        stem (str): 切り詰めてよい部分
+        suffix (str): そのまま残す部分 (番号や拡張子)
+        max_bytes (int): ファイル名の上限バイト数
+
+    Returns:
+        str: 切り詰めた stem
+    """
+    budget = max_bytes - len(suffix.encode('utf-8'))
+    encoded = stem.encode('utf-8')
+    if len(encoded) <= budget:
+        return stem
+    return encoded[:max(budget, 0)].decode('utf-8', errors='ignore').rstrip()
+
+
+def unique_names(names, occupied=(), case_insensitive=False, max_bytes=None):
+    """
+    名前の重複を解消し、重複分には " (2)" などの番号を付ける
+
+    Args:
+        names (list): 希望するファイル名のリスト
+        occupied (iterable): 既に使われている名前
+        case_insensitive (bool): 大文字小文字を区別しないファイルシステム用
+        max_bytes (int, optional): ファイル名の上限バイト数. 番号を付けた名前が
+            超える場合は番号が残るように元の名前の方を切り詰める
+
+    Returns:
+        list: 重複の無いファイル名のリスト (入力と同じ順)
+    """
+    normalize = str.casefold if case_insensitive else (lambda name: name)
+    taken = {normalize(name) for name in occupied}
+    next_suffix = {}
+    result = []
+
+    for name in names:
+        key = normalize(name)
+        if key in taken:
+            stem, ext = _split(name)
+            counter = next_suffix.get(key, 2)
+            while True:
+                suffix = f" ({counter}){ext}"
+                if max_bytes is not None:
+                    candidate = fit_stem(stem, suffix, max_bytes) + suffix
+                else:
+                    candidate = stem + suffix
+                counter += 1
+                if normalize(candidate) not in taken:
+                    break
+            next_suffix[key] = counter
+            name, key = candidate, normalize(candidate)
+        taken.add(key)
+        result.append(name)
+
+    return result
+
+
+class RenamePlan:
+    def __init__(self, steps, changes):
+        """
+        リネーム計画
+
+        Args:
+            steps (list): 実行順の (旧名, 新名) のリスト. 循環は一時名を経由する.
+            changes (list): ファイルごとの PlanChange (差分プレビュー用)
+        """
+        self.steps = steps
+        self.changes = changes
+
+    @property
+    def adjusted_count(self):
+        return sum(1 for change in self.changes if change.status == 'adjusted')
+
+    def page_count(self, page_size):
+        return max(1, (len(self.changes) + page_size - 1) // page_size)
+
+    def page(self, page, page_size):
+        """
+        差分プレビューの1ページ分を取得
+
+        Args:
+            page (int): ページ番号 (1始まり)
+            page_size (int): 1ページあたりの件数
+
+        Returns:
+            list: PlanChange のリスト
+        """
+        start = (page - 1) * page_size
+        return self.changes[start:start + page_size]
+
+
+def plan_renames(requests, existing_names, case_insensitive=False, max_bytes=None):
+    """
+    一括リネームの計画を作成 (O(n))
+
+    既存ファイル・計画済みの名前と衝突する新名には番号を付け、
+    a→b, b→a のような入れ替えや巡回は一時名を経由する手順に並べ替える。
+
+    Args:
+        requests (list): (旧ファイル名, 希望する新ファイル名) のリスト
+        existing_names (iterable): フォルダ内の既存ファイル名
+        case_insensitive (bool): 大文字小文字を区別しないファイルシステム用
+        max_bytes (int, optional): ファイル名の上限バイト数 (unique_names を参照)
+
+    Returns:
+        RenamePlan: 計画
+    """
+    normalize = str.casefold if case_insensitive else (lambda name: name)
+    existing = list(existing_names)
+    sources = {normalize(old) for old, _ in requests}
+
+    # 移動しないファイルの名前は使えない. 移動するファイルの旧名は空くので使える
+    moving = [(old, new) for old, new in requests if old != new]
+    occupied = [name for name in existing if normalize(name) not in sources]
+    occupied.extend(old for old, new in requests if old == new)
+    final_names = unique_names([new for _, new in moving], occupied, case_insensitive, max_bytes)
+
+    changes = []
+    moves = []
+    final_iter = iter(final_names)
+    for old, requested in requests:
+        if old == requested:
+            changes.append(PlanChange(old, requested, old, 'unchanged'))
+            continue
+        new = next(final_iter)
+        changes.append(PlanChange(old, requested, new, 'ok' if new == requested else 'adjusted'))
+        moves.append((old, new))
+
+    taken = {normalize(name) for name in existing} | {normalize(new) for _, new in moves}
+    return RenamePlan(_order_moves(moves, taken, normalize), changes)
+
+
+def _order_moves(moves, taken, normalize):
+    """
+    移動先が空いた順に手順を並べ、残った循環は一時名で切る
+
+    Args:
+        moves (list): (旧名, 新名) のリスト. 新名は互いに重複しない.
+        taken (set): 正規化済みの使用中の名前 (一時名の衝突回避用)
+        normalize (callable): 名前の正規化関数
+
+    Returns:
+        list: 実行順の (旧名, 新名) のリスト
+    """
+    pending = {normalize(old): (old, new) for old, new in moves}
+    # 移動先の名前 -> その名前を今占めている移動元 (移動元が動くまで待つ)
+    waiting = {}
+    ready = deque()
+    for old, new in moves:
+        if normalize(new) in pending and normalize(new) != normalize(old):
+            waiting[normalize(new)] = normalize(old)
+        else:
+            ready.append(normalize(old))
+
+    steps = []
+    order = [normalize(old) for old, _ in moves]
+    cursor = 0
+    token = uuid.uuid4().hex[:8]
+    temp_counter = 0
+
+    def release(key):
+        # key の名前が空いたので、そこへ移動したい移動元を実行可能にする
+        blocked = waiting.pop(key, None)
+        if blocked is not None:
+            ready.append(blocked)
+
+    while pending:
+        while ready:
+            key = ready.popleft()
+            old, new = pending.pop(key)
+            steps.append((old, new))
+            release(key)
+
+        # 残りはすべて循環. 1件を一時名へ退避して循環を切る
+        while cursor < len(order) and order[cursor] not in pending:
+            cursor += 1
+        if cursor == len(order):
+            break
+        key = order[cursor]
+        old, new = pending.pop(key)
+        _, ext = _split(old)
+        while True:
+            temp = f".renaming-{token}-{temp_counter}{ext}"
+            temp_counter += 1
+            if normalize(temp) not in taken:
+                break
+        taken.add(normalize(temp))
+        steps.append((old, temp))
+        pending[normalize(temp)] = (temp, new)
+        waiting[normalize(new)] = normalize(temp)
+        release(key)
+
+    return steps
@@ -1,9 +1,35 @@
 import streamlit as st
 import os
-import shutil
 from PIL import Image
 from PIL.ExifTags import TAGS
-import json
+import importlib
+from functools import lru_cache
+from backup import BACKUP_STRATEGIES, BACKUP_STRATEGY_LABELS, create_backup
+from folder_index import FolderIndex
+from folder_watcher import WatchSession
+from rename_planner import STATUS_LABELS as PLAN_STATUS_LABELS, fit_stem, plan_renames
+from rename_journal import STATUS_LABELS, STATUS_PENDING, STATUS_ROLLED_BACK, find_journals, run_batch
+
+# ファイル名にハイフンを含むため import_module で読み込む
+AppConfig = importlib.import_module('config-module').AppConfig
+WordManager = importlib.import_module('word-management').WordManager
+
+# 画像選択リストの1ページあたりの件数
+PAGE_SIZE = 200
+
+# サイドバーに表示するリネーム履歴の件数 (新しい順)
+JOURNALS_SHOWN = 5
+
+SORT_LABELS = {
+    'name': '名前順',
+    'mtime': '更新日時 (新しい順)',
+    'size': 'サイズ (大きい順)',
+}
+
+@lru_cache(maxsize=None)
+def _word_manager():
+    """プロセス内で共有する候補ワードの管理 (一覧は変更があるまでキャッシュされる)"""
+    return WordManager()
 
 class StreamlitRenameTool:
     def __init__(self):
@@ -16,22 +42,20 @@ class StreamlitRenameTool:
         # セッション状態の初期化
         if 'image_folder' not in st.session_state:
             st.session_state.image_folder = None
-        if 'images' not in st.session_state:
-            st.session_state.images = []
+        if 'folder_index' not in st.session_state:
+            st.session_state.folder_index = None
+        if 'folder_watcher' not in st.session_state:
+            st.session_state.folder_watcher = None
+        if 'metadata_cache' not in st.session_state:
+            st.session_state.metadata_cache = {}
         
         # 設定ファイルの読み込み
         self.load_config()
+        self.app_config = AppConfig()
         
     def load_config(self):
-        try:
-            with open('configs/word_candidates.json', 'r', encoding='utf-8') as f:
-                self.word_candidates = json.load(f)
-        except FileNotFoundError:
-            self.word_candidates = {
-                'characters': [],
-                'styles': [],
-                'templates': []
-            }
+        # 候補ワードはワード管理と同じ WordStore から読む (旧形式の JSON は初回に取り込まれる)
+        self.word_candidates = _word_manager().get_candidates()
     
     def select_folder(self):
         """フォルダ選択機能"""
@@ -48,15 +72,46 @@ class StreamlitRenameTool:
                 st.error("有効なフォルダを選択してください")
     
     def scan_images(self):
-        """画像をスキャンし、セッションに保存"""
-        supported_extensions = ['.jpg', '.jpeg', '.png', '.webp']
-        st.session_state.images = [
-            f for f in os.listdir(st.session_state.image_folder) 
-            if os.path.splitext(f)[1].lower() in supported_extensions
-        ]
+        """画像をスキャンし、インデックスをセッションに保存"""
+        self.stop_watcher()
+        index = FolderIndex(st.session_state.image_folder)
+        index.scan()
+        st.session_state.folder_index = index
+        st.session_state.metadata_cache.clear()
+    
+    def start_watcher(self):
+        """フォルダ監視を開始 (インデックスは監視スレッドが更新する)"""
+        watcher = st.session_state.folder_watcher
+        if watcher is not None and watcher.index is st.session_state.folder_index:
+            return
+        # 別のフォルダを監視していれば止める
+        self.stop_watcher()
+        st.session_state.folder_watcher = WatchSession(st.session_state.folder_index)
+    
+    def apply_watched_changes(self):
+        """監視で検出した変化をメタデータキャッシュに反映 (スクリプトのスレッドで呼ぶ)"""
+        watcher = st.session_state.folder_watcher
+        if watcher is None:
+            return
+        metadata_cache = st.session_state.metadata_cache
+        for name in watcher.drain():
+            if name is None:
+                metadata_cache.clear()
+            else:
+                metadata_cache.pop(name, None)
+    
+    def stop_watcher(self):
+        """フォルダ監視を停止"""
+        if st.session_state.folder_watcher is not None:
+            st.session_state.folder_watcher.stop()
+            st.session_state.folder_watcher = None
     
     def extract_metadata(self, file_path):
-        """画像からメタデータを抽出"""
+        """画像からメタデータを抽出 (ファイル名ごとにキャッシュ)"""
+        name = os.path.basename(file_path)
+        if name in st.session_state.metadata_cache:
+            return st.session_state.metadata_cache[name]
+        
         try:
             metadata_info = []
             image = Image.open(file_path)
@@ -68,6 +123,7 @@ class StreamlitRenameTool:
                     str_value = str(value)
                     metadata_info.append(str_value)
             
+            st.session_state.metadata_cache[name] = metadata_info
             return metadata_info
         except Exception as e:
             st.warning(f"メタデータ抽出エラー: {e}")
@@ -93,11 +149,62 @@ class StreamlitRenameTool:
         # メイン画面レイアウト
         col1, col2 = st.columns([2, 1])
         
+        # セッション復元時などインデックスが無い場合のみ走査
+        if st.session_state.folder_index is None:
+            self.scan_images()
+        index = st.session_state.folder_index
+        
+        # バックアップ方式
+        st.sidebar.header("バックアップ")
+        current_strategy = self.app_config.get_backup_strategy()
+        strategy = st.sidebar.selectbox(
+            "バックアップ方式",
+            BACKUP_STRATEGIES,
+            index=BACKUP_STRATEGIES.index(current_strategy) if current_strategy in BACKUP_STRATEGIES else 0,
+            format_func=BACKUP_STRATEGY_LABELS.get
+        )
+        if strategy != current_strategy:
+            self.app_config.set('backup_strategy', strategy)
+        
+        # 一括リネームの履歴 (中断したバッチの復旧・取り消し)
+        self.show_journals()
+        
+        # フォルダ監視 (新しい画像の追加・削除を自動で反映)
+        st.sidebar.header("フォルダ監視")
+        if st.sidebar.checkbox("フォルダを自動監視", value=st.session_state.folder_watcher is not None):
+            self.start_watcher()
+            self.apply_watched_changes()
+            watcher = st.session_state.folder_watcher
+            st.sidebar.caption("inotify で監視中" if watcher.mode == 'inotify' else "更新日時のポーリングで監視中")
+            if st.sidebar.button("表示を更新"):
+                st.rerun()
+        else:
+            self.stop_watcher()
+        
         with col1:
-            # 画像選択
+            # 並び順とページ
+            col_sort, col_page = st.columns(2)
+            with col_sort:
+                sort_key = st.selectbox(
+                    "並び順",
+                    list(SORT_LABELS.keys()),
+                    format_func=SORT_LABELS.get
+                )
+            total_pages = index.page_count(PAGE_SIZE)
+            with col_page:
+                page_number = st.number_input(
+                    "ページ",
+                    min_value=1,
+                    max_value=total_pages,
+                    value=1
+                )
+            st.caption(f"全 {len(index)} 枚 / {total_pages} ページ")
+            
+            # 画像選択 (表示中のページ分のみ)
+            page_entries = index.page(page_number, PAGE_SIZE, sort=sort_key, reverse=sort_key != 'name')
             selected_image = st.selectbox(
                 "リネームする画像を選択", 
-                st.session_state.images
+                [entry.name for entry in page_entries]
             )
             
             # 画像プレビュー
@@ -124,21 +231,122 @@ class StreamlitRenameTool:
                     old_path = os.path.join(st.session_state.image_folder, selected_image)
                     new_path = os.path.join(st.session_state.image_folder, new_filename)
                     
+                    # 既存ファイルへの上書きは不可 (os.rename は黙って上書きするため事前に確認)
+                    if new_filename != selected_image and os.path.lexists(new_path):
+                        raise FileExistsError(f"{new_filename} は既に存在します")
+                    
                     # バックアップフォルダ作成
-                    backup_folder = os.path.join(st.session_state.image_folder, 'backup')
+                    backup_folder = self.app_config.get_backup_folder(st.session_state.image_folder)
                     os.makedirs(backup_folder, exist_ok=True)
                     
-                    # バックアップ
-                    shutil.copy2(old_path, os.path.join(backup_folder, selected_image))
+                    # バックアップ (同一ボリュームならハードリンクで実質コストなし)
+                    create_backup(
+                        old_path,
+                        os.path.join(backup_folder, selected_image),
+                        self.app_config.get_backup_strategy()
+                    )
                     
                     # リネーム
                     os.rename(old_path, new_path)
                     st.success(f"{selected_image} を {new_filename} にリネームしました")
                     
-                    # 画像リストを更新
-                    self.scan_images()
+                    # 画像リストを差分更新
+                    index.rename(selected_image, new_filename)
                 except Exception as e:
                     st.error(f"リネーム中にエラーが発生: {e}")
+            
+            # 一括リネーム (表示中の並び順で連番を付与)
+            with st.expander("一括リネーム"):
+                base_name = st.text_input("ベース名", key="batch_base_name")
+                col_start, col_digits = st.columns(2)
+                with col_start:
+                    start_number = st.number_input("開始番号", min_value=0, value=1, key="batch_start")
+                with col_digits:
+                    digits = st.number_input("桁数", min_value=1, max_value=8, value=3, key="batch_digits")
+                
+                if st.button("プレビュー", disabled=not base_name):
+                    entries = index.page(1, max(len(index), 1), sort=sort_key, reverse=sort_key != 'name')
+                    max_bytes = self.app_config.get('max_filename_length', 255)
+                    requests = []
+                    for number, entry in enumerate(entries, start_number):
+                        # 長いベース名は連番と拡張子が残るように切り詰める
+                        suffix = f"_{number:0{digits}d}{os.path.splitext(entry.name)[1]}"
+                        requests.append((entry.name, fit_stem(base_name, suffix, max_bytes) + suffix))
+                    # 重複・既存ファイルとの衝突と入れ替え(a→b, b→a)を解決した計画
+                    st.session_state.rename_plan = plan_renames(requests, index.names(), max_bytes=max_bytes)
+                
+                plan = st.session_state.get('rename_plan')
+                if plan is not None:
+                    self.show_plan(plan)
+                    if st.button("一括リネーム実行", type="primary"):
+                        self.run_batch_rename(plan.steps)
+                        st.session_state.rename_plan = None
+    
+    def show_plan(self, plan):
+        """
+        リネーム計画の差分をページ単位で表示
+        
+        Args:
+            plan (RenamePlan): 表示する計画
+        """
+        st.caption(f"{len(plan.changes)} 件 (重複のため変更: {plan.adjusted_count} 件)")
+        total_pages = plan.page_count(PAGE_SIZE)
+        page_number = st.number_input(
+            "プレビューのページ",
+            min_value=1,
+            max_value=total_pages,
+            value=1,
+            key="plan_page"
+        )
+        st.dataframe(
+            [
+                {'旧ファイル名': change.old, '新ファイル名': change.new,
+                 '備考': PLAN_STATUS_LABELS[change.status]}
+                for change in plan.page(page_number, PAGE_SIZE)
+            ],
+            use_container_width=True
+        )
+    
+    def _on_renamed(self, old_name, new_name):
+        """リネーム結果をインデックスとメタデータキャッシュに反映"""
+        st.session_state.folder_index.rename(old_name, new_name)
+        st.session_state.metadata_cache.pop(old_name, None)
+    
+    def run_batch_rename(self, pairs):
+        """
+        ジャーナル付きで一括リネームを実行
+        
+        Args:
+            pairs (list): (旧ファイル名, 新ファイル名) のリスト
+        """
+        try:
+            run_batch(st.session_state.image_folder, pairs, on_rename=self._on_renamed)
+            st.success(f"{len(pairs)} 件の画像をリネームしました")
+        except Exception as e:
+            st.error(f"一括リネーム中にエラーが発生: {e} (サイドバーのリネーム履歴から元に戻せます)")
+    
+    def show_journals(self):
+        """サイドバーにリネーム履歴と取り消し・再実行ボタンを表示"""
+        journals = find_journals(st.session_state.image_folder, limit=JOURNALS_SHOWN)
+        if not journals:
+            return
+        
+        st.sidebar.header("リネーム履歴")
+        for journal in journals:
+            name = os.path.basename(journal.path)
+            st.sidebar.write(f"{journal.created} - {len(journal.pairs)} 件 ({STATUS_LABELS[journal.status]})")
+            if journal.status == STATUS_ROLLED_BACK:
+                continue
+            col_undo, col_redo = st.sidebar.columns(2)
+            with col_undo:
+                if st.button("元に戻す", key=f"rollback_{name}"):
+                    count = journal.rollback(on_rename=self._on_renamed)
+                    st.sidebar.success(f"{count} 件を元に戻しました")
+            if journal.status == STATUS_PENDING:
+                with col_redo:
+                    if st.button("続きを実行", key=f"replay_{name}"):
+                        count = journal.replay(on_rename=self._on_renamed)
+                        st.sidebar.success(f"{count} 件をリネームしました")
     
     def run(self):
         """アプリケーションの実行"""
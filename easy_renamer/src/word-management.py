@@ -1,33 +1,51 @@
 import json
 import os
+from word_store import WordStore
+
+DEFAULT_CATEGORIES = ('characters', 'styles', 'templates')
 
 class WordManager:
     def __init__(self, file_path='configs/word_candidates.json'):
         """
         ワード管理クラスの初期化
         
+        候補ワードは file_path と同じ場所の .sqlite3 に保存し、追加・削除は
+        1行ずつ書き込む。旧形式の JSON があれば初回に取り込む。
+        
         Args:
             file_path (str): 候補ワードを保存するJSONファイルのパス
         """
         self.file_path = file_path
-        self.candidates = self.load_candidates()
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        self.store = WordStore(os.path.splitext(file_path)[0] + '.sqlite3')
+        self.load_candidates()
     
     def load_candidates(self):
         """
-        候補ワードをJSONファイルからロード
+        候補ワードをロード (ストアが空の場合のみ JSON から取り込む)
         
         Returns:
             dict: カテゴリごとの候補ワード
         """
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {
-                'characters': [],
-                'styles': [],
-                'templates': []
-            }
+        if self.store.is_empty():
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    self.store.bulk_import(json.load(f))
+            except FileNotFoundError:
+                self.store.bulk_import({category: [] for category in DEFAULT_CATEGORIES})
+        return self.store.as_dict()
+    
+    def import_candidates(self, candidates):
+        """
+        候補ワードを1トランザクションでまとめて追加
+        
+        Args:
+            candidates (dict): {カテゴリ名: ワードのリスト}
+        
+        Returns:
+            int: 追加したワード数
+        """
+        return self.store.bulk_import(candidates)
     
     def add_candidate(self, category, word):
         """
@@ -37,12 +55,7 @@ class WordManager:
             category (str): カテゴリ名
             word (str): 追加するワード
         """
-        if category not in self.candidates:
-            self.candidates[category] = []
-        
-        if word not in self.candidates[category]:
-            self.candidates[category].append(word)
-            self.save_candidates()
+        self.store.add(category, word)
     
     def remove_candidate(self, category, word):
         """
@@ -52,9 +65,20 @@ class WordManager:
             category (str): カテゴリ名
             word (str): 削除するワード
         """
-        if category in self.candidates and word in self.candidates[category]:
-            self.candidates[category].remove(word)
-            self.save_candidates()
+        self.store.remove(category, word)
+    
+    def has_candidate(self, category, word):
+        """
+        候補ワードが登録済みかどうか
+        
+        Args:
+            category (str): カテゴリ名
+            word (str): ワード
+        
+        Returns:
+            bool: 登録済みなら True
+        """
+        return self.store.contains(category, word)
     
     def get_candidates(self, category=None):
         """
@@ -67,13 +91,11 @@ class WordManager:
             list or dict: 候補ワード
         """
         if category:
-            return self.candidates.get(category, [])
-        return self.candidates
+            return self.store.words(category)
+        return self.store.as_dict()
     
     def save_candidates(self):
         """
-        候補ワードをJSONファイルに保存
+        候補ワードを保存 (追加・削除の時点で書き込み済みのため何もしない)
         """
-        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.candidates, f, ensure_ascii=False, indent=4)
+        pass
@@ -0,0 +1,226 @@
+import sqlite3
+import threading
+
+
+class WordStore:
+    def __init__(self, path):
+        """
+        カテゴリ別単語リストの SQLite ストア
+
+        (カテゴリ, 単語) の一意インデックスで重複確認・追加・削除を1行ずつ行い、
+        ファイル全体の書き直しは行わない。WAL モードのため読み込みは書き込みを待たない。
+        一覧は変更があるまでキャッシュする (他プロセスの変更は data_version で検知)。
+
+        Args:
+            path (str): データベースファイルのパス
+        """
+        self.path = path
+        self.version = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._cache_key = None
+
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS categories ('
+                ' id INTEGER PRIMARY KEY,'
+                ' name TEXT NOT NULL UNIQUE)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS words ('
+                ' id INTEGER PRIMARY KEY,'
+                ' category_id INTEGER NOT NULL REFERENCES categories (id),'
+                ' word TEXT NOT NULL,'
+                ' UNIQUE (category_id, word))'
+            )
+            # カテゴリ内を追加順に読むためのインデックス
+            conn.execute('CREATE INDEX IF NOT EXISTS words_category ON words (category_id, id)')
+
+    def _connection(self):
+        """スレッドごとの接続 (SQLite の接続はスレッド間で共有しない)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _changed(self):
+        with self._lock:
+            self.version += 1
+            self._cache = {}
+
+    def _cached(self, key, load):
+        """変更が無ければ前回の結果を返す"""
+        conn = self._connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        with self._lock:
+            cache_key = (self.version, data_version)
+            if self._cache_key != cache_key:
+                self._cache = {}
+                self._cache_key = cache_key
+            if key in self._cache:
+                return self._cache[key]
+        value = load(conn)
+        with self._lock:
+            # 読み込み中に変更された場合はキャッシュしない
+            if self._cache_key == cache_key and self.version == cache_key[0]:
+                self._cache[key] = value
+        return value
+
+    def _category_id(self, conn, category):
+        """カテゴリの id を取得 (無ければ作成)"""
+        conn.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (category,))
+        return conn.execute('SELECT id FROM categories WHERE name = ?', (category,)).fetchone()[0]
+
+    def is_empty(self):
+        """
+        カテゴリが1つも無いかどうか
+
+        Returns:
+            bool: 空なら True
+        """
+        return self._connection().execute('SELECT 1 FROM categories LIMIT 1').fetchone() is None
+
+    def add_category(self, category):
+        """
+        カテゴリを追加 (既存なら何もしない)
+
+        Args:
+            category (str): カテゴリ名
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (category,))
+        self._changed()
+
+    def add(self, category, word):
+        """
+        単語を追加 (カテゴリが無ければ作成)
+
+        Args:
+            category (str): カテゴリ名
+            word (str): 単語
+
+        Returns:
+            bool: 追加した場合 True, 既に登録済みの場合 False
+        """
+        conn = self._connection()
+        with conn:
+            category_id = self._category_id(conn, category)
+            added = conn.execute(
+                'INSERT OR IGNORE INTO words (category_id, word) VALUES (?, ?)', (category_id, word)
+            ).rowcount == 1
+        # 登録済みの単語ならカテゴリも既存なので変更なし
+        if added:
+            self._changed()
+        return added
+
+    def remove(self, category, word):
+        """
+        単語を削除
+
+        Args:
+            category (str): カテゴリ名
+            word (str): 単語
+
+        Returns:
+            bool: 削除した場合 True
+        """
+        conn = self._connection()
+        with conn:
+            removed = conn.execute(
+                'DELETE FROM words WHERE word = ? AND category_id ='
+                ' (SELECT id FROM categories WHERE name = ?)', (word, category)
+            ).rowcount == 1
+        if removed:
+            self._changed()
+        return removed
+
+    def contains(self, category, word):
+        """
+        単語が登録済みかどうか (一意インデックスで検索)
+
+        Args:
+            category (str): カテゴリ名
+            word (str): 単語
+
+        Returns:
+            bool: 登録済みなら True
+        """
+        return self._connection().execute(
+            'SELECT 1 FROM words JOIN categories ON categories.id = words.category_id'
+            ' WHERE categories.name = ? AND words.word = ?', (category, word)
+        ).fetchone() is not None
+
+    def bulk_import(self, categories):
+        """
+        カテゴリごとの単語を1トランザクションでまとめて登録 (登録済みの単語は無視)
+
+        Args:
+            categories (dict): {カテゴリ名: 単語のリスト}
+
+        Returns:
+            int: 追加した単語数
+        """
+        conn = self._connection()
+        added = 0
+        with conn:
+            for category, words in categories.items():
+                category_id = self._category_id(conn, category)
+                added += conn.executemany(
+                    'INSERT OR IGNORE INTO words (category_id, word) VALUES (?, ?)',
+                    ((category_id, word) for word in words)
+                ).rowcount
+        self._changed()
+        return added
+
+    def categories(self):
+        """
+        カテゴリ一覧を作成順に取得
+
+        Returns:
+            list: カテゴリ名のリスト (変更しないこと)
+        """
+        return self._cached(None, lambda conn: [
+            name for name, in conn.execute('SELECT name FROM categories ORDER BY id')
+        ])
+
+    def words(self, category):
+        """
+        カテゴリの単語を追加順に取得
+
+        Args:
+            category (str): カテゴリ名
+
+        Returns:
+            list: 単語のリスト (変更しないこと)
+        """
+        return self._cached(('words', category), lambda conn: [
+            word for word, in conn.execute(
+                'SELECT word FROM words WHERE category_id ='
+                ' (SELECT id FROM categories WHERE name = ?) ORDER BY id', (category,)
+            )
+        ])
+
+    def all_words(self):
+        """
+        全カテゴリの単語をカテゴリ順・追加順に取得
+
+        Returns:
+            list: 単語のリスト (変更しないこと)
+        """
+        return self._cached('all', lambda conn: [
+            word for word, in conn.execute('SELECT word FROM words ORDER BY category_id, id')
+        ])
+
+    def as_dict(self):
+        """
+        {カテゴリ名: 単語のリスト} 形式で取得
+
+        Returns:
+            dict: カテゴリごとの単語
+        """
+        return {category: self.words(category) for category in self.categories()}
@@ -0,0 +1,66 @@
+import os
+
+from modules.core import RenamerCore, default_settings
+from modules.name_template import NameTemplate
+from src.rename_planner import unique_names
+
+LONG_TEXT = 'あ' * 100
+
+
+def _core():
+    return RenamerCore(default_settings(), report=lambda message: None)
+
+
+def _sources(folder, count=3):
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"f{i}.png")
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        paths.append(path)
+    return paths
+
+
+def test_long_text_keeps_the_counter(tmp_path):
+    files = _sources(str(tmp_path))
+    for position in ('suffix', 'prefix'):
+        names = [name for _, name in _core().plan_filenames(
+            files, LONG_TEXT, "{n:02d}", position, 'copy', None
+        )]
+        assert len(set(names)) == len(names)
+        assert all(len(name.encode('utf-8')) <= 255 for name in names)
+        assert all(f"{n:02d}" in name for n, name in enumerate(names, 1))
+
+
+def test_duplicate_suffix_stays_within_limit(tmp_path):
+    files = _sources(str(tmp_path))
+    output = tmp_path / 'out'
+    # A numbering format without {n} makes every name collide
+    results = _core().rename_files(files, LONG_TEXT, str(output), custom_numbering="X")
+    assert len(results) == len(files)
+    assert all(len(name.encode('utf-8')) <= 255 for name in os.listdir(output))
+
+
+def test_in_place_rename_with_long_text(tmp_path):
+    files = _sources(str(tmp_path))
+    names = [os.path.basename(file) for file in files]
+    _core().rename_in_place(str(tmp_path), names, LONG_TEXT, custom_numbering="X")
+    renamed = [name for name in os.listdir(tmp_path) if name.endswith('.png')]
+    assert len(renamed) == len(files)
+    assert all(len(name.encode('utf-8')) <= 255 for name in renamed)
+
+
+def test_render_batch_cuts_text_not_counter():
+    template = NameTemplate("{text} {n:03d}")
+    contexts = [{'n': n, 'text': 'う' * 120} for n in (1, 2)]
+    names, errors = template.render_batch(contexts, ['.png', '.png'], 255)
+    assert not errors
+    assert names[0].endswith(' 001.png') and names[1].endswith(' 002.png')
+    assert all(len(name.encode('utf-8')) <= 255 for name in names)
+
+
+def test_unique_names_max_bytes():
+    name = 'え' * 83 + '.png'
+    names = unique_names([name] * 3, max_bytes=253)
+    assert len(set(names)) == 3
+    assert all(len(candidate.encode('utf-8')) <= 253 for candidate in names)
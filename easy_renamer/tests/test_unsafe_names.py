@@ -0,0 +1,64 @@
+import os
+
+from modules.core import RenamerCore, default_settings
+from modules.name_template import NameTemplate, safe_filename
+
+
+def _core():
+    return RenamerCore(default_settings(), report=lambda message: None)
+
+
+def test_safe_filename():
+    assert safe_filename('a/b\\c') == 'a_b_c'
+    assert safe_filename('a\nb\x00c') == 'a_b_c'
+    assert safe_filename('../up') == '___up'
+    assert safe_filename('a..b') == 'a..b'
+
+
+def test_rendered_values_are_escaped():
+    template = NameTemplate("{text} {stem} {keywords} {n}")
+    contexts = [{'n': 1, 'text': 'a/b', 'stem': '..', 'keywords': ['x/y', 'z\tw']}]
+    names, errors = template.render_batch(contexts, ['.png'])
+    assert not errors
+    assert names == ['a_b .. x_y z_w 1.png']
+    assert NameTemplate("{stem}").render({'stem': '..'}) == '__'
+
+
+def test_fitted_names_are_escaped():
+    template = NameTemplate("{text} {n:03d}")
+    contexts = [{'n': 1, 'text': '../' + 'う' * 120}]
+    names, _ = template.render_batch(contexts, ['.png'], 255)
+    assert os.sep not in names[0] and not names[0].startswith('.')
+    assert names[0].endswith(' 001.png')
+
+
+def test_rename_text_with_slash(tmp_path):
+    source = tmp_path / 'f.png'
+    source.write_bytes(b'x')
+    output = tmp_path / 'out'
+    results = _core().rename_files([str(source)], 'a/b', str(output))
+    assert len(results) == 1
+    assert os.listdir(output) == ['a_b 01.png']
+
+
+def test_in_place_rename_stays_in_folder(tmp_path):
+    folder = tmp_path / 'images'
+    folder.mkdir()
+    (folder / 'a.png').write_bytes(b'x')
+    (folder / 'b.png').write_bytes(b'x')
+    core = _core()
+    core.rename_in_place(str(folder), ['a.png'], '../escaped', custom_numbering='{n}')
+    core.rename_in_place(str(folder), [], '', pairs=[(str(folder / 'b.png'), '../pair.png')])
+    assert sorted(os.listdir(tmp_path)) == ['images']
+    assert sorted(name for name in os.listdir(folder) if name.endswith('.png')) == ['___escaped 1.png', '___pair.png']
+
+
+def test_batch_names_stay_in_output(tmp_path):
+    source = tmp_path / 'f.png'
+    source.write_bytes(b'x')
+    core = _core()
+    pairs = core.plan_batch_names([str(source)], "{text}/{keywords}", keywords=[([], ['../k'])], text='..')
+    assert pairs[0][1] == '___.._k.png'
+    output = tmp_path / 'out'
+    core.rename_files([], '', str(output), pairs=[(str(source), '../up.png')])
+    assert os.listdir(output) == ['___up.png']
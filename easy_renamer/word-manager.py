@@ -1,63 +1,59 @@
 import os
 import json
+from src.word_store import WordStore
 
 class WordManager:
     def __init__(self, data_file="word_data.json"):
         self.data_file = data_file
-        self.categories = {}
+        # 単語は SQLite に保存し、変更は1行ずつ書き込む
+        self.store = WordStore(os.path.splitext(data_file)[0] + '.sqlite3')
         self.load_data()
     
     def load_data(self):
+        if not self.store.is_empty():
+            return
+        # 旧形式の JSON があれば一度だけ取り込む
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.categories = json.load(f)
+                    self.store.bulk_import(json.load(f))
+                return
             except Exception as e:
                 print(f"単語データの読み込みエラー: {str(e)}")
-                self.initialize_data()
-        else:
-            self.initialize_data()
+        self.initialize_data()
     
     def initialize_data(self):
-        self.categories = {
+        self.store.bulk_import({
             "キャラクター": [],
             "髪色": ["赤髪", "青髪", "金髪", "黒髪", "白髪", "緑髪", "紫髪", "ピンク髪"],
             "瞳の色": ["赤瞳", "青瞳", "緑瞳", "金瞳", "黒瞳", "紫瞳"],
             "服装": ["制服", "ドレス", "水着", "メイド服", "コスプレ"],
             "その他": []
-        }
-        self.save_data()
+        })
     
     def save_data(self):
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.categories, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"単語データの保存エラー: {str(e)}")
+        # 追加・削除の時点で書き込み済み
+        pass
+    
+    def import_words(self, categories):
+        """{カテゴリ: 単語リスト} をまとめて追加し、追加した単語数を返す"""
+        return self.store.bulk_import(categories)
     
     def add_word(self, category, word):
-        if category not in self.categories:
-            self.categories[category] = []
-        
-        if word not in self.categories[category]:
-            self.categories[category].append(word)
-            self.save_data()
+        self.store.add(category, word)
     
     def remove_word(self, category, word):
-        if category in self.categories and word in self.categories[category]:
-            self.categories[category].remove(word)
-            self.save_data()
+        self.store.remove(category, word)
+    
+    def has_word(self, category, word):
+        return self.store.contains(category, word)
     
     def get_categories(self):
-        return list(self.categories.keys())
+        return list(self.store.categories())
     
     def get_words(self, category):
-        if category in self.categories:
-            return self.categories[category]
-        return []
+        return self.store.words(category)
     
     def get_all_words(self):
-        all_words = []
-        for category in self.categories:
-            all_words.extend(self.categories[category])
-        return all_words
+        # 変更があるまで同じリストを返す
+        return self.store.all_words()